@@ -1,31 +1,155 @@
-from flask import Flask, request, jsonify, Response
-from utils.db_connector import DBManagement
-import json
+from flask import Flask, request, jsonify, Response, g
+from utils.db_connector import DBManagement, PoolExhausted
+from utils.facility import UnknownFacility, validate_facilities
+from utils.response import encode_body, etag_matches, etag_headers, lookup_etag, page_options
+from utils.metrics import metrics
+import os
+import time
 import pandas as pd
-from typing import List
+from typing import List, Dict
 from utils.manage_response import *
 
 
 app = Flask(__name__)
 
+# maximum number of candidate locations in one /db_check_batch request
+max_batch_points = 100
+
+# optional in-process spatial index instead of the radius SQL (STUDIO_SPATIAL_INDEX=1)
+## STUDIO_SNAPSHOT=data/facility_snapshot maps the snapshot of the build/update scripts instead of scanning the tables
+if os.environ.get('STUDIO_SNAPSHOT'):
+    use_snapshot_index(os.environ['STUDIO_SNAPSHOT'])
+elif os.environ.get('STUDIO_SPATIAL_INDEX') == '1':
+    use_spatial_index()
+
+# optional single-table radius SQL over the unified facility table (STUDIO_UNIFIED_TABLE=1)
+if os.environ.get('STUDIO_UNIFIED_TABLE') == '1':
+    use_unified_table()
+
+# optional precomputed count tiles for /db_count (STUDIO_DENSITY_TILES=data/density_tiles)
+if os.environ.get('STUDIO_DENSITY_TILES'):
+    use_density_tiles(os.environ['STUDIO_DENSITY_TILES'])
+
+# optional precomputed score raster for /score, /score_tile (STUDIO_SCORE_RASTER=data/score_raster)
+if os.environ.get('STUDIO_SCORE_RASTER'):
+    score_raster = use_score_raster(os.environ['STUDIO_SCORE_RASTER'])
+
+# optional geo-quantized response cache (STUDIO_RADIUS_CACHE=1)
+if os.environ.get('STUDIO_RADIUS_CACHE') == '1':
+    radius_cache = use_radius_cache(max_size=int(os.environ.get('STUDIO_RADIUS_CACHE_SIZE', 4096)),
+                                     ttl=float(os.environ.get('STUDIO_RADIUS_CACHE_TTL', 300)))
+
+
+def json_response(response_dict: Dict, status: int = 200, etag: str = None) -> Response:
+    """
+    UTF-8 JSON, compressed when the client accepts it(utils/response.py)
+    """
+    with metrics.stage('serialize'):
+        body, headers = encode_body(response_dict, request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype='application/json', status=status, headers=headers)
+
+    if etag is not None:
+        response.headers.update(etag_headers(etag))
+    return response
+
+def request_etag() -> str:
+    """
+    ETag of a GET lookup: served data version + path + query parameters
+    - None while the version is unknown or the in-process index is being rebuilt
+    """
+    return lookup_etag(served_data_version(), request.path, request.args)
+
+def not_modified(etag: str) -> Response:
+    return Response(status=304, headers={**etag_headers(etag), 'Vary': 'Accept-Encoding'})
+
+@app.before_request
+def start_timer():
+    if metrics.enabled:
+        g.metrics_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response: Response) -> Response:
+    # latency per route pattern(not per raw path, coordinates would explode the label set)
+    start = g.get('metrics_start')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unknown'
+        metrics.observe_request(endpoint, response.status_code, time.perf_counter() - start)
+    return response
 
 @app.route('/')
 def index():
     return "Hello Flask"
 
+@app.errorhandler(PoolExhausted)
+def pool_exhausted(e):
+    # every pooled connection is busy: ask the web server to retry instead of queueing forever
+    response_dict = {'status': 503, 'message': str(e)}
+    return json_response(response_dict, 503)
+
+@app.errorhandler(UnknownFacility)
+def unknown_facility(e):
+    # rejected before any cache/DB lookup
+    return bad_request(str(e))
+
+@app.route('/db_pool')
+def db_pool():
+    # pool-exhaustion metrics(checkouts, waits, timeouts, ...)
+    pool_status = DBManagement.pool.status() if DBManagement.pool is not None else {}
+    return json_response(pool_status, 200)
+
+@app.route('/metrics')
+def metrics_text():
+    # Prometheus text format(stage/request latency histograms, rows per kind, slow queries)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/spatial_index')
+def spatial_index_info():
+    # hot reload state(version, swaps, failures, build time) and size of the in-process index
+    return json_response(spatial_index_status(), 200)
+
+@app.route('/single_flight')
+def single_flight():
+    # coalesced radius lookups(shared = DB executions saved)
+    return json_response(radius_flight.status(), 200)
+
+@app.route('/cache')
+def cache():
+    # radius cache hit/miss counters
+    cache_status = radius_cache.status() if radius_cache is not None else {}
+    return json_response(cache_status, 200)
+
+def bad_request(message: str) -> Response:
+    response_dict = {'status': 400, 'message': message}
+    return json_response(response_dict, 400)
+
 @app.route('/db_check', methods=['GET'])
 def db_check():
     if request.method == 'GET':
 
 
         # requested data from web server
-        facilities_type = request.args.get('facilities_type').split(',')
+        facilities_type = validate_facilities(request.args.get('facilities_type').split(','))
         lat             = float(request.args.get('lat'))
         lon             = float(request.args.get('lon'))
         radius_meter    = int(request.args.get('radius'))
-        
-        # request to rds
-        response_list = request_to_rds(facilities_type, lat, lon, radius_meter)
+        cursor          = request.args.get('cursor')
+
+        # same data version and parameters as the client's copy: 304 without any lookup
+        etag = request_etag()
+        if etag is not None and etag_matches(request.headers.get('If-None-Match'), etag):
+            return not_modified(etag)
+
+        try:
+            summary, limit = page_options(request.args)
+            paged = summary or limit is not None or cursor is not None
+
+            # request to rds
+            if paged:
+                response_list = request_to_rds_page(facilities_type, lat, lon, radius_meter, summary, limit, cursor)
+            else:
+                response_list = request_to_rds(facilities_type, lat, lon, radius_meter)
+        except ValueError as e:
+            return bad_request(str(e))
 
         total_count   = response_list[0]
         facility_body = response_list[1]
@@ -40,8 +164,10 @@ def db_check():
                                     'hashtag': hashtag_list
                                     }
                         }
+        if paged:
+            response_dict['location']['next_cursor'] = response_list[3]
 
-        response = Response(json.dumps(response_dict), mimetype='application/json', status=200)
+        response = json_response(response_dict, 200, etag=etag)
         
         return response
 
@@ -52,7 +178,7 @@ def db_check():
 def db_check_two():
     if request.method == 'GET':
         
-        facilities_type = request.args.get('facilities_type').split(',')
+        facilities_type = validate_facilities(request.args.get('facilities_type').split(','))
         radius_meter = int(request.args.get('radius'))
 
         #location 1
@@ -62,12 +188,22 @@ def db_check_two():
         lat_2 = float(request.args.get('lat_2'))
         lon_2 = float(request.args.get('lon_2'))
 
-        # response for location 1
-        response_list_1 = request_to_rds(facilities_type, lat_1, lon_1, radius_meter)
-        total_count_1, facility_body_1, hashtag_list_1  = response_list_1[0], response_list_1[1], response_list_1[2]
+        cursors = [request.args.get('cursor_1'), request.args.get('cursor_2')]
+
+        etag = request_etag()
+        if etag is not None and etag_matches(request.headers.get('If-None-Match'), etag):
+            return not_modified(etag)
 
-        # response for location 2
-        response_list_2 = request_to_rds(facilities_type, lat_2, lon_2, radius_meter)
+        # response for location 1, 2 (looked up concurrently)
+        try:
+            summary, limit = page_options(request.args)
+            paged = summary or limit is not None or any(cursors)
+            response_list_1, response_list_2 = request_to_rds_many(facilities_type, [(lat_1, lon_1), (lat_2, lon_2)], radius_meter,
+                                                                   summary=summary, limit=limit, cursors=cursors if paged else None)
+        except ValueError as e:
+            return bad_request(str(e))
+
+        total_count_1, facility_body_1, hashtag_list_1  = response_list_1[0], response_list_1[1], response_list_1[2]
         total_count_2, facility_body_2, hashtag_list_2  = response_list_2[0], response_list_2[1], response_list_2[2]
 
         # scoring
@@ -97,8 +233,11 @@ def db_check_two():
                                                }
                                     },
                         }
+        if paged:
+            response_dict['location_1']['next_cursor'] = response_list_1[3]
+            response_dict['location_2']['next_cursor'] = response_list_2[3]
 
-        response = Response(json.dumps(response_dict), mimetype='application/json', status=200)
+        response = json_response(response_dict, 200, etag=etag)
         return response
 
         
@@ -106,6 +245,129 @@ def db_check_two():
     else:
         return 'Not Get request', 404
 
+@app.route('/db_count')
+def db_count():
+    """
+    Counts, hashtags and score of one location without place lists
+    - approximate when the density tiles are loaded: error_margin(meter) is the width of the ring
+      around the radius in which places may be miscounted, 0 for exact counts
+    """
+    facilities_type = validate_facilities(request.args.get('facilities_type').split(','))
+    lat             = float(request.args.get('lat'))
+    lon             = float(request.args.get('lon'))
+    radius_meter    = int(request.args.get('radius'))
+
+    total_count, facility_body, hashtag_list, error_margin = request_counts(facilities_type, lat, lon, radius_meter)
+    individual_score, total_score = calculate_score(facilities_type, total_count, facility_body)
+
+    response_dict = {
+                    'status'  : 200,
+                    'location': {
+                                'total_count' : total_count,
+                                'facility_type' : facility_body,
+                                'hashtag': hashtag_list,
+                                'score' : {
+                                        "total_score": total_score,
+                                        "individual_score": individual_score
+                                           },
+                                'error_margin': round(error_margin, 1)
+                                }
+                    }
+    return json_response(response_dict, 200)
+
+@app.route('/score')
+def score():
+    """
+    Precomputed score and hashtags of the raster cell nearest to lat, lon
+    """
+    if score_raster is None:
+        return json_response({'status': 503, 'message': 'score raster is not loaded'}, 503)
+
+    try:
+        location = score_raster.point(int(request.args.get('radius')), float(request.args.get('lat')), float(request.args.get('lon')))
+    except (TypeError, ValueError) as e:
+        return bad_request(str(e))
+
+    response_dict = {'status': 200, 'location': location}
+    return json_response(response_dict, 200)
+
+@app.route('/score_tile')
+def score_tile():
+    """
+    Total scores of the raster cells in a box, for the heatmap
+    - bbox=lat_min,lon_min,lat_max,lon_max, step=every n-th cell
+    """
+    if score_raster is None:
+        return json_response({'status': 503, 'message': 'score raster is not loaded'}, 503)
+
+    try:
+        bbox = tuple(float(value) for value in request.args.get('bbox').split(','))
+        if len(bbox) != 4:
+            raise ValueError(f'bbox must be lat_min,lon_min,lat_max,lon_max: {bbox}')
+        tile = score_raster.window(int(request.args.get('radius')), bbox, step=int(request.args.get('step', 1)))
+    except (AttributeError, TypeError, ValueError) as e:
+        return bad_request(str(e))
+
+    response_dict = {'status': 200, 'tile': tile}
+    return json_response(response_dict, 200)
+
+@app.route('/db_check_batch', methods=['POST'])
+def db_check_batch():
+    """
+    Compare many candidate locations at once
+    - body: {"points": [[lat, lon], ...], "radius": 500, "facilities_type": ["cafe", "bus"], "detail": false}
+    - response: locations ranked by total_score
+    """
+    body = request.get_json(silent=True) or {}
+
+    try:
+        facilities_type = body['facilities_type']
+        if isinstance(facilities_type, str):
+            facilities_type = facilities_type.split(',')
+        validate_facilities(facilities_type)
+        radius_meter = int(body['radius'])
+        locations = [(float(lat), float(lon)) for lat, lon in body['points']]
+    except UnknownFacility as e:
+        return bad_request(str(e))
+    except (KeyError, TypeError, ValueError):
+        return bad_request('points, radius, facilities_type are required')
+
+    if not 0 < len(locations) <= max_batch_points:
+        return bad_request(f'points must have 1 ~ {max_batch_points} locations')
+
+    # one round trip for every location, then one scoring kernel for the whole batch
+    ## detail off: aggregate SQL only(counts, flag sums), no place rows
+    if body.get('detail'):
+        response_lists = search_radius_batch(facilities_type, locations, radius_meter)
+    else:
+        response_lists = count_radius_batch(facilities_type, locations, radius_meter)
+    total_counts = [response_list[0] for response_list in response_lists]
+    facility_bodies = [response_list[1] for response_list in response_lists]
+    individual_scores, total_scores = calculate_score_batch(facilities_type, total_counts, facility_bodies)
+
+    location_list = []
+    for i, (lat, lon) in enumerate(locations):
+        location_list.append({
+                            'index': i,
+                            'lat': lat,
+                            'lon': lon,
+                            'total_count': total_counts[i],
+                            'facility_type': facility_bodies[i],
+                            'hashtag': response_lists[i][2],
+                            'score': {
+                                    'total_score': total_scores[i],
+                                    'individual_score': individual_scores[i]
+                                    }
+                            })
+
+    # rank by total score
+    location_list.sort(key=lambda location: location['score']['total_score'], reverse=True)
+    for rank, location in enumerate(location_list, start=1):
+        location['rank'] = rank
+
+    response_dict = {'status': 200, 'locations': location_list}
+    return json_response(response_dict, 200)
+
 if __name__ == "__main__":
     app.run(debug=True)
 
@@ -0,0 +1,171 @@
+"""
+- Async(ASGI) entry point with the same /db_check, /db_check_two contracts as app.py
+  (mode/limit/cursor, ETag/If-None-Match, 400 for bad parameters), always answered by the radius SQL
+- run : hypercorn asgi_app:app
+"""
+from quart import Quart, request, Response
+
+from utils.async_db_connector import AsyncDBManagement
+from utils.facility import UnknownFacility, validate_facilities
+from utils.response import encode_body, etag_matches, etag_headers, lookup_etag, page_options
+from utils.async_manage_response import (request_to_rds_async, request_to_rds_page_async, request_to_rds_many_async,
+                                         data_version, score_weights)
+from utils.manage_response import db_info_path, calculate_score
+
+
+app = Quart(__name__)
+
+
+def json_response(response_dict: dict, status: int = 200, etag: str = None) -> Response:
+    # same serializer, compression and ETag headers as app.py
+    body, headers = encode_body(response_dict, request.headers.get('Accept-Encoding'))
+    if etag is not None:
+        headers.update(etag_headers(etag))
+    return Response(body, mimetype='application/json', status=status, headers=headers)
+
+def request_etag() -> str:
+    # no in-process index here: responses always come from the polled data version
+    return lookup_etag(data_version.version, request.path, request.args)
+
+def not_modified(etag: str) -> Response:
+    return Response('', status=304, headers={**etag_headers(etag), 'Vary': 'Accept-Encoding'})
+
+def bad_request(message: str) -> Response:
+    response_dict = {'status': 400, 'message': message}
+    return json_response(response_dict, 400)
+
+
+@app.before_serving
+async def open_pool():
+    await AsyncDBManagement.init_pool(db_info_path)
+    # data version and score weights through aiomysql before the first request
+    await data_version.check(force=True)
+    await score_weights.get()
+
+@app.after_serving
+async def close_pool():
+    await AsyncDBManagement.close_pool()
+
+@app.errorhandler(UnknownFacility)
+async def unknown_facility(e):
+    # rejected before any DB lookup
+    return bad_request(str(e))
+
+@app.before_request
+async def poll_data_version():
+    # weights follow the ingest runs like the WSGI app(at most one poll per check_interval)
+    await data_version.check()
+
+@app.route('/')
+async def index():
+    return "Hello Quart"
+
+@app.route('/db_check', methods=['GET'])
+async def db_check():
+
+    # requested data from web server
+    facilities_type = validate_facilities(request.args.get('facilities_type').split(','))
+    lat             = float(request.args.get('lat'))
+    lon             = float(request.args.get('lon'))
+    radius_meter    = int(request.args.get('radius'))
+    cursor          = request.args.get('cursor')
+
+    # same data version and parameters as the client's copy: 304 without any lookup
+    etag = request_etag()
+    if etag is not None and etag_matches(request.headers.get('If-None-Match'), etag):
+        return not_modified(etag)
+
+    try:
+        summary, limit = page_options(request.args)
+        paged = summary or limit is not None or cursor is not None
+
+        # request to rds
+        if paged:
+            response_list = await request_to_rds_page_async(facilities_type, lat, lon, radius_meter, summary, limit, cursor)
+        else:
+            response_list = await request_to_rds_async(facilities_type, lat, lon, radius_meter)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    total_count, facility_body, hashtag_list = response_list[0], response_list[1], response_list[2]
+
+    # response to web_server
+    response_dict = {
+                    'status'  : 200,
+                    'location': {
+                                'total_count' : total_count,
+                                'facility_type' : facility_body,
+                                'hashtag': hashtag_list
+                                }
+                    }
+    if paged:
+        response_dict['location']['next_cursor'] = response_list[3]
+
+    return json_response(response_dict, 200, etag=etag)
+
+@app.route('/db_check_two')
+async def db_check_two():
+
+    facilities_type = validate_facilities(request.args.get('facilities_type').split(','))
+    radius_meter = int(request.args.get('radius'))
+
+    #location 1
+    lat_1 = float(request.args.get('lat_1'))
+    lon_1 = float(request.args.get('lon_1'))
+    #location 2
+    lat_2 = float(request.args.get('lat_2'))
+    lon_2 = float(request.args.get('lon_2'))
+
+    cursors = [request.args.get('cursor_1'), request.args.get('cursor_2')]
+
+    etag = request_etag()
+    if etag is not None and etag_matches(request.headers.get('If-None-Match'), etag):
+        return not_modified(etag)
+
+    # response for location 1, 2 (looked up concurrently)
+    try:
+        summary, limit = page_options(request.args)
+        paged = summary or limit is not None or any(cursors)
+        response_list_1, response_list_2 = await request_to_rds_many_async(facilities_type, [(lat_1, lon_1), (lat_2, lon_2)], radius_meter,
+                                                                           summary=summary, limit=limit, cursors=cursors if paged else None)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    total_count_1, facility_body_1, hashtag_list_1 = response_list_1[0], response_list_1[1], response_list_1[2]
+    total_count_2, facility_body_2, hashtag_list_2 = response_list_2[0], response_list_2[1], response_list_2[2]
+
+    # scoring
+    weight = await score_weights.get()
+    individual_score_1, total_score_1 = calculate_score(facilities_type, total_count_1, facility_body_1, weight)
+    individual_score_2, total_score_2 = calculate_score(facilities_type, total_count_2, facility_body_2, weight)
+
+    # response to web server
+    response_dict = {
+                    'status'  : 200,
+                    'location_1': {
+                                'total_count' : total_count_1,
+                                'facility_type' : facility_body_1,
+                                'hashtag': hashtag_list_1,
+                                'score' : {
+                                        "total_score": total_score_1,
+                                        "individual_score": individual_score_1
+                                           }
+                                },
+                    'location_2': {
+                                'total_count' : total_count_2,
+                                'facility_type' : facility_body_2,
+                                'hashtag': hashtag_list_2,
+                                'score' : {
+                                        "total_score": total_score_2,
+                                        "individual_score": individual_score_2
+                                           }
+                                },
+                    }
+    if paged:
+        response_dict['location_1']['next_cursor'] = response_list_1[3]
+        response_dict['location_2']['next_cursor'] = response_list_2[3]
+
+    return json_response(response_dict, 200, etag=etag)
+
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -0,0 +1,49 @@
+"""
+- Add feature flag columns(is_fitness, is_coin_laundry, is_starbucks) to existing localdata tables
+- new tables get them from info/schema/localdata_table.csv and LocalDataPreprocess
+"""
+
+import sys
+import os
+import warnings
+warnings.filterwarnings(action='ignore')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.load_data import RequestLocalData
+from utils.db_connector import DBManagement
+from utils.hashtag import feature_flags
+from utils.manage_response import invalidate_radius_cache
+
+current_file_path = os.path.abspath(__file__)
+root_path = os.path.dirname(os.path.dirname(current_file_path))
+
+
+if __name__ == "__main__":
+
+    # db connection
+    db_info_path = os.path.join(root_path, 'secret_key', 'db_info.txt')
+    db_info_dict = DBManagement.get_db_info(db_info_path)
+    dbm = DBManagement(**db_info_dict)
+    print(f'성공적으로 MySQL {db_info_dict["database"]} 데이터베이스에 연결 완료')
+
+    excel_data_path = os.path.join(root_path, 'data', 'local_excel_data')
+    folder_names_list = RequestLocalData.get_folder_names(excel_data_path)
+
+    for folder_name in folder_names_list:
+        table_name = folder_name[3:]
+
+        # flag columns right after y, before lon/lat/coordinates(same order as the schema file)
+        after = 'y'
+        for flag, pattern in feature_flags.items():
+            dbm.add_column(table_name, flag, 'TINYINT(1) NOT NULL DEFAULT 0', after)
+            after = flag
+
+            # backfill with the same case-sensitive pattern as LocalDataPreprocess.add_feature_flags
+            dbm.cursor.execute(f"UPDATE {table_name} SET {flag} = IFNULL(REGEXP_LIKE(bplcNm, %s, 'c'), 0)", (pattern,))
+            dbm.commit()
+
+        print(f"{folder_name} 작업 완료")
+
+    invalidate_radius_cache(dbm)
+    print('feature flag 작업 완료')
+    dbm.cursor.close()
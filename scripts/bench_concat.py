@@ -0,0 +1,77 @@
+"""
+- Benchmark of page accumulation in the RequestData crawlers(utils/load_data.py)
+- before : pd.concat of the accumulated frame and the new page inside the page loop
+- after  : page generator + collect_pages(one concat)
+- synthetic bus API pages(json_normalize of item dicts), default 200 pages x 1000 rows
+- run : python scripts/bench_concat.py --pages 200 --rows 1000
+"""
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import time
+import tracemalloc
+from typing import Iterator
+
+import pandas as pd
+
+from utils.load_data import collect_pages
+
+
+def make_page(page_no: int, rows: int) -> dict:
+    rng = random.Random(page_no)
+    items = [{'nodeid': f'DJB{page_no:04d}{i:04d}',
+              'nodenm': f'정류장 {page_no}-{i}',
+              'nodeno': rng.randint(10000, 99999),
+              'gpslati': 36.3 + rng.uniform(-0.1, 0.1),
+              'gpslong': 127.4 + rng.uniform(-0.1, 0.1)} for i in range(rows)]
+    return {'response': {'body': {'totalCount': rows, 'items': {'item': items}}}}
+
+
+def iter_pages(pages: list) -> Iterator[pd.DataFrame]:
+    # make_dataframe of every page is done up front: only the accumulation is measured
+    yield from pages
+
+
+def accumulate_before(pages: list) -> pd.DataFrame:
+    page_iter = iter_pages(pages)
+    response_dataframe = next(page_iter)
+    for tmp_dataframe in page_iter:
+        response_dataframe = pd.concat([response_dataframe, tmp_dataframe])
+    response_dataframe.reset_index(drop=True, inplace=True)
+    return response_dataframe
+
+
+def accumulate_after(pages: list) -> pd.DataFrame:
+    return collect_pages(iter_pages(pages))
+
+
+def measure(function, pages: list):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(pages)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    pages = [pd.json_normalize(make_page(page_no, args.rows)['response']['body']['items']['item'])
+             for page_no in range(args.pages)]
+
+    before, before_seconds, before_peak = measure(accumulate_before, pages)
+    after, after_seconds, after_peak = measure(accumulate_after, pages)
+    pd.testing.assert_frame_equal(before, after)
+
+    print(f"{args.pages} pages x {args.rows} rows = {len(after)} rows")
+    print(f"{'':24s} {'time(s)':>10s} {'peak(MB)':>10s}")
+    print(f"{'before concat in loop':24s} {before_seconds:10.2f} {before_peak / 2**20:10.1f}")
+    print(f"{'after collect_pages':24s} {after_seconds:10.2f} {after_peak / 2**20:10.1f}")
@@ -0,0 +1,94 @@
+"""
+- Microbenchmark of find_hashtag per request
+- before : pandas DataFrame per facility kind + .str.contains
+- after  : precompiled rules in utils/hashtag.py over the place lists
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import timeit
+import pandas as pd
+from typing import List
+
+from utils.manage_response import find_hashtag, facility_kinds
+
+
+# pandas implementation before the rule engine(kept for comparison)
+def legacy_initialize_dataframe(data_dict: dict, key: str) -> pd.DataFrame:
+    try:
+        dataframe = pd.DataFrame(data_dict[key]['place'])
+    except:
+        dataframe = pd.DataFrame()
+    
+    return dataframe
+
+def legacy_find_hashtag(location_dict: dict ) -> List[str]:
+
+    hashtag_list = []
+
+    # 데이터 초기화
+    dataframes = {}
+    for category in facility_kinds:
+        dataframes[category] = legacy_initialize_dataframe(location_dict, category)
+
+    
+    # 헬스장
+    if not dataframes['gym'].empty and dataframes['gym']['name'].str.contains('헬스|짐|gym|피트니스|휘트니스|fitness|PT|피티', regex=True).any():
+        hashtag_list.append("#헬스장")
+        
+    # 코인빨래방
+    if not dataframes['laundry'].empty and dataframes['laundry']['name'].str.contains('코인|크린토피아|셀프|24', regex=True).any():
+        hashtag_list.append("#코인빨래방")
+    
+    #대형쇼핑몰
+    if len(dataframes['mart']) >= 1:
+        hashtag_list.append("#마트/쇼핑몰")
+    
+    #편세권
+    if len(dataframes['convenience']) >= 3:
+        hashtag_list.append("#편세권")
+    
+    # 스세권
+    if not dataframes['cafe'].empty and dataframes['cafe']['name'].str.contains('스타벅스', regex=True).any():
+        hashtag_list.append("#스세권")
+        
+    # 역세권
+    if len(dataframes['metro']) >= 3:
+        hashtag_list.append("#초역세권")
+    elif len(dataframes['metro']) >= 1:
+        hashtag_list.append('#역세권')
+        
+        
+    return hashtag_list
+
+
+# 1km radius in central Seoul 정도의 장소 개수
+place_counts = {'hospital': 300, 'pharmacy': 120, 'laundry': 40, 'hair': 400, 'gym': 60,
+                'mart': 5, 'convenience': 150, 'cafe': 500, 'bus': 200, 'metro': 4}
+
+def make_facility_body(seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    names = ['커피', '스타벅스', '헬스', '코인빨래방', '약국', '미용실', '의원', 'GS25', '정류장', '역']
+
+    facility_body = {}
+    for facility, count in place_counts.items():
+        places = [{'name': f'{rng.choice(names)} {i}호점', 'distance': rng.randint(0, 1000),
+                   'address': '서울특별시', 'lat': '37.5', 'lon': '127.0'} for i in range(count)]
+        facility_body[facility] = {'count': count, 'place': places}
+
+    return facility_body
+
+
+if __name__ == "__main__":
+    facility_body = make_facility_body()
+    assert legacy_find_hashtag(facility_body) == find_hashtag(facility_body)
+
+    number = 200
+    before = timeit.timeit(lambda: legacy_find_hashtag(facility_body), number=number) / number
+    after = timeit.timeit(lambda: find_hashtag(facility_body), number=number) / number
+
+    print(f"before(pandas) : {before * 1e6:10.1f} us/request")
+    print(f"after(rules)   : {after * 1e6:10.1f} us/request")
+    print(f"speedup        : {before / after:10.1f}x")
@@ -0,0 +1,65 @@
+"""
+- Benchmark of the /db_check response body for a 1km radius in central Seoul
+- before : json.dumps(ASCII escaped), uncompressed
+- after  : utils/response.py(orjson or UTF-8 json), gzip / brotli when accepted
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import random
+import timeit
+
+from utils.response import dumps, compress, orjson, brotli
+
+
+# 1km radius in central Seoul 정도의 장소 개수
+place_counts = {'hospital': 300, 'pharmacy': 120, 'laundry': 40, 'hair': 400, 'gym': 60,
+                'mart': 5, 'convenience': 150, 'cafe': 500, 'bus': 200, 'metro': 4}
+
+def make_response_dict(seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    names = ['스타벅스 광화문점', '메가커피', '365일 헬스클럽', '크린토피아 코인빨래방', '온누리약국',
+             '준오헤어', '서울내과의원', 'GS25 종로점', '세종문화회관', '광화문역']
+    roads = ['세종대로', '종로', '새문안로', '율곡로', '삼일대로']
+
+    facility_body = {}
+    for facility, count in place_counts.items():
+        places = [{'name': f'{rng.choice(names)} {i}',
+                   'distance': rng.randint(0, 1000),
+                   'address': None if facility == 'bus' else f'서울특별시 종로구 {rng.choice(roads)} {rng.randint(1, 300)}',
+                   'lat': f'{37.5663 + rng.uniform(-0.009, 0.009):.7f}',
+                   'lon': f'{126.9779 + rng.uniform(-0.011, 0.011):.7f}'} for i in range(count)]
+        facility_body[facility] = {'count': count, 'place': sorted(places, key=lambda place: place['distance'])}
+
+    return {'status': 200,
+            'location': {'total_count': sum(place_counts.values()),
+                         'facility_type': facility_body,
+                         'hashtag': ['#헬스장', '#코인빨래방', '#마트/쇼핑몰', '#편세권', '#스세권', '#초역세권']}}
+
+
+def measure(function, number: int = 50) -> float:
+    return timeit.timeit(function, number=number) / number
+
+
+if __name__ == "__main__":
+    response_dict = make_response_dict()
+    assert json.loads(dumps(response_dict)) == response_dict
+
+    before = json.dumps(response_dict).encode()
+    after = dumps(response_dict)
+
+    print(f"serializer : {'orjson' if orjson is not None else 'json(ensure_ascii=False)'}")
+    print(f"{'':24s} {'time(us)':>10s} {'bytes':>10s}")
+    print(f"{'before json.dumps':24s} {measure(lambda: json.dumps(response_dict).encode()) * 1e6:10.1f} {len(before):10d}")
+    print(f"{'after dumps':24s} {measure(lambda: dumps(response_dict)) * 1e6:10.1f} {len(after):10d}")
+
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    for encoding in encodings:
+        body = compress(after, encoding)
+        elapsed = measure(lambda: compress(dumps(response_dict), encoding))
+        print(f"{'after dumps + ' + encoding:24s} {elapsed * 1e6:10.1f} {len(body):10d}")
+
+    if brotli is None:
+        print("brotli is not installed: br is not offered")
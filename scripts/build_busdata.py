@@ -1,6 +1,15 @@
+"""
+- Build bus data to MySQL
+- target : Seoul bus API + bus API of every other city
+- cities are crawled concurrently, finished cities are checkpointed in data/bus_data/checkpoints
+  and skipped when the script is run again after a failure(--fresh ignores them)
+- run : python scripts/build_busdata.py --rate 5 --burst 5 --workers 8
+"""
+
 import sys
 import os
 import warnings
+import argparse
 warnings.filterwarnings(action='ignore')
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -9,15 +18,26 @@ import time
 import math
 from tqdm import tqdm
 
-from utils.load_data import RequestSeoulBusData, RequestOtherBusData
+from utils.load_data import RequestSeoulBusData, RequestOtherBusData, IncompleteCrawl
+from utils.rate_limit import TokenBucket
 from utils.preprocess import SeoulBusDataPreprocess, OtherBusDataPreprocess
 from utils.db_connector import DBManagement
+from utils.snapshot import dump_facility_snapshot
+from utils.facility import sync_unified_table
 
 current_file_path = os.path.abspath(__file__)
 root_path = os.path.dirname(os.path.dirname(current_file_path))
 
 
 if __name__ == "__main__":
+    # API quota(requests per second, burst) shared by the city workers
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=RequestOtherBusData.default_rate)
+    parser.add_argument('--burst', type=int, default=RequestOtherBusData.default_burst)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--fresh', action='store_true', help='ignore the checkpoints of a previous run')
+    args = parser.parse_args()
+
     # key 파일 열기
     auth_key_bus_path = os.path.join(root_path, "secret_key", "auth_key_bus.txt")
 
@@ -36,7 +56,11 @@ if __name__ == "__main__":
     # 1. data request to bus API
     ## get total bus dataframe
     req_bus_seoul = RequestSeoulBusData(auth_key_seoul)
-    req_bus_other = RequestOtherBusData(auth_key_other)
+    checkpoint_path = os.path.join(root_path, "data", "bus_data", "checkpoints")
+    req_bus_other = RequestOtherBusData(auth_key_other, limiter=TokenBucket(args.rate, args.burst),
+                                        max_workers=args.workers, checkpoint_path=checkpoint_path)
+    if args.fresh:
+        req_bus_other.clear_checkpoints()
 
 
     other_info = {
@@ -57,7 +81,12 @@ if __name__ == "__main__":
                 }
     
 
-    other_bus_df = req_bus_other.get_apidata(info=other_info)
+    # failed cities: stop before any DB write, the finished cities stay checkpointed for the rerun
+    try:
+        other_bus_df = req_bus_other.get_apidata(info=other_info)
+    except IncompleteCrawl as e:
+        print(f"{e}\n다시 실행하면 실패한 도시만 요청합니다")
+        sys.exit(1)
     seoul_bus_df = req_bus_seoul.get_apidata(info=seoul_info)
 
     # # 2. data preprocess
@@ -114,6 +143,19 @@ if __name__ == "__main__":
     dbm.create_spatial_index(table_name, 'coordinates')
     dbm.commit()
 
+    # unified facility table
+    facility_table_df = dbm.set_table(os.path.join(root_path, "info", "schema", "facility_table.csv"))
+    sync_unified_table(dbm, table_name, facility_table_df)
+
+    # serving 쪽 cache, score weight 갱신을 위해 data version 올리기
+    dbm.bump_data_version()
+
+    # memory-mapped facility snapshot for the serving workers
+    dump_facility_snapshot(dbm, os.path.join(root_path, 'data', 'facility_snapshot'))
+
+    # the next build crawls every city again
+    req_bus_other.clear_checkpoints()
+
     print("버스데이터 작업 완료")
     dbm.cursor.close()
 
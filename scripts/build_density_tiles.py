@@ -0,0 +1,69 @@
+"""
+- Build the density tiles for /db_count(utils/density.py)
+- one row-cumulative count layer per facility kind, plus one per keyword hashtag flag(gym.is_fitness, ...)
+- run after the build/update scripts : python scripts/build_density_tiles.py --cell-meter 50
+- 50m cells over the Korea box = 12454 x 13133 cells, 330MB(uint16) ~ 650MB(uint32) per layer
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from typing import Iterator, Tuple
+
+from utils.db_connector import DBManagement
+from utils.density import DensityGrid, build_tiles, flag_layers, layer_name
+from utils.facility import facility_registry
+
+current_file_path = os.path.abspath(__file__)
+root_path = os.path.dirname(os.path.dirname(current_file_path))
+
+
+def read_layers(dbm: DBManagement) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+    """
+    (layer name, lat, lon) of every kind and flag layer, from the same tables as request_to_rds
+    """
+    flags_by_kind = {}
+    for facility, flag in flag_layers():
+        flags_by_kind.setdefault(facility, []).append(flag)
+
+    for kind, spec in facility_registry.items():
+        flags = [flag for flag in flags_by_kind.get(kind, []) if flag in spec.extra_columns]
+        flag_column = "".join([f", {flag}" for flag in flags])
+
+        dbm.cursor.execute(f"SELECT lat, lon{flag_column} FROM {spec.table}")
+        df = pd.DataFrame(dbm.cursor.fetchall(), columns=['lat', 'lon', *flags])
+
+        # lat, lon are CHAR columns
+        df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
+        df['lon'] = pd.to_numeric(df['lon'], errors='coerce')
+        df = df.dropna(subset=['lat', 'lon'])
+
+        yield kind, df['lat'].to_numpy(), df['lon'].to_numpy()
+        for flag in flags:
+            flagged = df[df[flag].astype(int) > 0]
+            yield layer_name(kind, flag), flagged['lat'].to_numpy(), flagged['lon'].to_numpy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cell-meter', type=float, default=50.0)
+    parser.add_argument('--out', default=os.path.join(root_path, 'data', 'density_tiles'))
+    args = parser.parse_args()
+
+    # db connection
+    db_info_path = os.path.join(root_path, 'secret_key', 'db_info.txt')
+    db_info_dict = DBManagement.get_db_info(db_info_path)
+    dbm = DBManagement(**db_info_dict)
+    print(f'성공적으로 MySQL {db_info_dict["database"]} 데이터베이스에 연결 완료')
+
+    grid = DensityGrid(cell_meter=args.cell_meter)
+    print(f'grid {grid.n_rows} x {grid.n_cols}, error margin {grid.error_margin():.1f}m')
+
+    build_tiles(args.out, read_layers(dbm), grid)
+
+    dbm.cursor.close()
+    print('density tiles 작업 완료')
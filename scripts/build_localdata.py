@@ -17,6 +17,8 @@ from tqdm import tqdm
 from utils.load_data import RequestLocalData
 from utils.preprocess import LocalDataPreprocess
 from utils.db_connector import DBManagement
+from utils.snapshot import dump_facility_snapshot
+from utils.facility import facility_registry, sync_unified_table
 
 current_file_path = os.path.abspath(__file__)
 root_path = os.path.dirname(os.path.dirname(current_file_path))
@@ -39,6 +41,10 @@ if __name__ == "__main__":
     localdata_table_df = dbm.set_table(localdata_table_path)
     localdata_table_columns = dbm.get_columns(localdata_table_df)
 
+    # every kind is also copied into the unified facility table
+    facility_table_path = os.path.join(root_path, "info", "schema", "facility_table.csv")
+    facility_table_df = dbm.set_table(facility_table_path)
+
     # excel_data_path
     excel_data_path = os.path.join(root_path, 'data', 'local_excel_data')
     csv_data_path = os.path.join(root_path, 'data', 'local_csv_data')
@@ -80,9 +86,19 @@ if __name__ == "__main__":
         # create spatial index
         dbm.create_spatial_index(table_name, 'coordinates')
         dbm.commit()
+
+        # unified facility table
+        if table_name in facility_registry:
+            sync_unified_table(dbm, table_name, facility_table_df)
         
 
         print(f"{folder_name} 작업 완료")
 
+    # serving 쪽 cache, score weight 갱신을 위해 data version 올리기
+    dbm.bump_data_version()
+
+    # memory-mapped facility snapshot for the serving workers
+    dump_facility_snapshot(dbm, os.path.join(root_path, 'data', 'facility_snapshot'))
+
     print('localdata 작업 완료')
     dbm.cursor.close()
\ No newline at end of file
@@ -12,6 +12,8 @@ from tqdm import tqdm
 from utils.load_data import RequestMetroData
 from utils.preprocess import MetroDataPreprocess
 from utils.db_connector import DBManagement
+from utils.snapshot import dump_facility_snapshot
+from utils.facility import sync_unified_table
 
 current_file_path = os.path.abspath(__file__)
 root_path = os.path.dirname(os.path.dirname(current_file_path))
@@ -87,6 +89,16 @@ if __name__ == "__main__":
     dbm.create_spatial_index(table_name, 'coordinates')
     dbm.commit()
 
+    # unified facility table
+    facility_table_df = dbm.set_table(os.path.join(root_path, "info", "schema", "facility_table.csv"))
+    sync_unified_table(dbm, table_name, facility_table_df)
+
+    # serving 쪽 cache, score weight 갱신을 위해 data version 올리기
+    dbm.bump_data_version()
+
+    # memory-mapped facility snapshot for the serving workers
+    dump_facility_snapshot(dbm, os.path.join(root_path, 'data', 'facility_snapshot'))
+
     print("지하철데이터 작업 완료")
     dbm.cursor.close()
 
@@ -0,0 +1,33 @@
+"""
+- Build the score raster for /score, /score_tile(utils/score_raster.py)
+- calculate_score + find_hashtag on a regular grid over Seoul, from the density tiles(scripts/build_density_tiles.py)
+- run : python scripts/build_score_raster.py --radius 500 1000 --raster-meter 100
+"""
+
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.score_raster import build_score_raster, seoul_bbox
+
+current_file_path = os.path.abspath(__file__)
+root_path = os.path.dirname(os.path.dirname(current_file_path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--radius', type=int, nargs='+', default=[500, 1000])
+    parser.add_argument('--raster-meter', type=float, default=100.0)
+    parser.add_argument('--bbox', type=float, nargs=4, default=list(seoul_bbox), metavar=('LAT_MIN', 'LON_MIN', 'LAT_MAX', 'LON_MAX'))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tiles', default=os.path.join(root_path, 'data', 'density_tiles'))
+    parser.add_argument('--out', default=os.path.join(root_path, 'data', 'score_raster'))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_score_raster(args.tiles, args.out, args.radius, bbox=tuple(args.bbox),
+                       raster_meter=args.raster_meter, workers=args.workers)
+
+    print(f'score raster 작업 완료: {time.perf_counter() - start:.1f}s')
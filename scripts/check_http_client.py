@@ -0,0 +1,146 @@
+"""
+- Check of utils/http_client.py against a local stub API server(no network, no auth key)
+- keep-alive: many pages over one connection
+- retries: 503 then 200, data.go.kr quota page, read timeout
+- exit code 1 if any check fails
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from utils.http_client import HttpClient
+
+quota_page = ('<OpenAPI_ServiceResponse><cmmMsgHeader><errMsg>SERVICE ERROR</errMsg>'
+              '<returnAuthMsg>LIMITED_NUMBER_OF_SERVICE_REQUESTS_EXCEEDS_ERROR</returnAuthMsg>'
+              '<returnReasonCode>22</returnReasonCode></cmmMsgHeader></OpenAPI_ServiceResponse>')
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.connections = 0
+        self.hits = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send(self, status: int, body: str, content_type: str = 'application/json') -> None:
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client already gave up(read timeout)
+            pass
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        with self.server.lock:
+            hit = self.server.hits[url.path] = self.server.hits.get(url.path, 0) + 1
+
+        if url.path == '/page':
+            self.send(200, json.dumps({'pageNo': int(params['pageNo'][0])}))
+        elif url.path == '/flaky':
+            # two 503s then the page
+            if hit <= 2:
+                self.send(503, 'Service Unavailable', 'text/plain')
+            else:
+                self.send(200, json.dumps({'ok': True}))
+        elif url.path == '/quota':
+            self.send(200, quota_page, 'text/xml')
+        elif url.path == '/slow':
+            time.sleep(0.5)
+            self.send(200, json.dumps({'ok': True}))
+        else:
+            self.send(404, 'Not Found', 'text/plain')
+
+
+def check(name: str, passed: bool, detail: str = '') -> bool:
+    print(f"{'OK  ' if passed else 'FAIL'} {name} {detail}")
+    return passed
+
+
+if __name__ == "__main__":
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = HttpClient(read_timeout=0.2, max_retries=3, backoff=0.01)
+    results = []
+
+    # 1. keep-alive: 50 pages, one connection
+    pages = [client.get_json(f'{server.url}/page', params={'pageNo': page_no})['pageNo'] for page_no in range(50)]
+    results.append(check('keep-alive', pages == list(range(50)) and server.connections == 1,
+                         f'(connections={server.connections})'))
+
+    # 2. 503 twice, then 200
+    before = client.status()
+    response = client.get_json(f'{server.url}/flaky')
+    results.append(check('retry 5xx', response == {'ok': True} and client.status()['retries'] - before['retries'] == 2,
+                         f'(retries={client.status()["retries"] - before["retries"]})'))
+
+    # 3. quota page on every attempt: retried max_retries times then raised
+    before = client.status()
+    try:
+        client.get_json(f'{server.url}/quota')
+        raised = False
+    except requests.HTTPError:
+        raised = True
+    results.append(check('quota page', raised and server.hits['/quota'] == client.max_retries + 1,
+                         f'(attempts={server.hits["/quota"]})'))
+
+    # 4. read timeout on every attempt
+    try:
+        client.get(f'{server.url}/slow')
+        raised = False
+    except requests.Timeout:
+        raised = True
+    results.append(check('read timeout', raised and server.hits['/slow'] == client.max_retries + 1,
+                         f'(attempts={server.hits["/slow"]})'))
+
+    # 5. 404 is not retried
+    try:
+        client.get(f'{server.url}/missing')
+        raised = False
+    except requests.HTTPError:
+        raised = True
+    results.append(check('no retry on 404', raised and server.hits['/missing'] == 1))
+
+    print(f"stats: {client.status()}")
+    results.append(check('counters', client.status()['failures'] == 3 and client.status()['bytes'] > 0))
+
+    server.shutdown()
+    client.close()
+
+    if not all(results):
+        sys.exit(1)
+    print('http client 확인 완료')
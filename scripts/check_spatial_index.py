@@ -0,0 +1,75 @@
+"""
+- Regression check: the radius SQL of request_to_rds must use the SPATIAL INDEX
+- runs EXPLAIN on the generated query of every facility table
+- exit code 1 if any table is scanned without spatial_index(made by DBManagement.create_spatial_index)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import List, Dict, Tuple
+
+from utils.db_connector import DBManagement
+from utils.facility import get_facility, unified_table
+from utils.manage_response import facility_kinds, build_radius_query, build_count_query, build_unified_query
+
+current_file_path = os.path.abspath(__file__)
+root_path = os.path.dirname(os.path.dirname(current_file_path))
+
+# 서울시청, 1km
+lat, lon, radius_meter = 37.5663, 126.9779, 1000
+index_name = 'spatial_index'
+
+
+def explain(dbm: DBManagement, query: Tuple[str, List]) -> List[Dict]:
+    statement, params = query
+    dbm.cursor.execute(f"EXPLAIN {statement}", tuple(params))
+    columns = [column[0] for column in dbm.cursor.description]
+
+    return [dict(zip(columns, row)) for row in dbm.cursor.fetchall()]
+
+
+if __name__ == "__main__":
+
+    # db connection
+    db_info_path = os.path.join(root_path, 'secret_key', 'db_info.txt')
+    db_info_dict = DBManagement.get_db_info(db_info_path)
+    dbm = DBManagement(**db_info_dict)
+    print(f'성공적으로 MySQL {db_info_dict["database"]} 데이터베이스에 연결 완료')
+
+    failed = []
+    for facility in facility_kinds:
+        queries = {'radius': build_radius_query(facility, lat, lon, radius_meter),
+                   'page': build_radius_query(facility, lat, lon, radius_meter, limit=10),
+                   'count': build_count_query(facility, lat, lon, radius_meter)}
+
+        for name, query in queries.items():
+            # the row which reads the facility table itself
+            plan = [row for row in explain(dbm, query) if row['table'] == get_facility(facility).table]
+            keys = [row['key'] for row in plan]
+
+            if keys and all(key == index_name for key in keys):
+                print(f"[OK]   {facility:12s} {name:6s} key={index_name} rows={plan[0]['rows']}")
+            else:
+                print(f"[FAIL] {facility:12s} {name:6s} plan={plan}")
+                failed.append((facility, name))
+
+    # unified facility table, only when the build scripts made it
+    if dbm.has_table(unified_table):
+        plan = [row for row in explain(dbm, build_unified_query(facility_kinds, lat, lon, radius_meter)) if row['table'] == unified_table]
+        keys = [row['key'] for row in plan]
+
+        if keys and all(key == index_name for key in keys):
+            print(f"[OK]   {unified_table:12s} {'radius':6s} key={index_name} rows={plan[0]['rows']}")
+        else:
+            print(f"[FAIL] {unified_table:12s} {'radius':6s} plan={plan}")
+            failed.append((unified_table, 'radius'))
+
+    dbm.cursor.close()
+
+    if failed:
+        print(f"spatial index를 사용하지 않는 query: {failed}")
+        sys.exit(1)
+
+    print('모든 radius query가 spatial index를 사용합니다')
@@ -8,7 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
-from utils.load_data import RequestLocalData
+from utils.load_data import RequestLocalData, collect_pages
 
 current_file_path = os.path.abspath(__file__)
 root_path = os.path.dirname(os.path.dirname(current_file_path))
@@ -35,25 +35,16 @@ if __name__ == "__main__":
         for file_name in file_list:
 
             # 한 파일이 여러 sheet로 구성되어 있을 경우, 모든 sheet 모음
-            base = pd.DataFrame()
             file_path = os.path.join(folder_path, file_name)
             for i in range(10):
                 try:
                     file = pd.read_excel(file_path, sheet_name = i)
-                    base = base.append(file, ignore_index=True)
+                    dataframe_list.append(file)
                 except:
                     break
 
-            dataframe_list.append(base)
-
-        # file들 다 채우면 통합할 일만 남았다       
-        base = pd.DataFrame()
-
-        for tmp in dataframe_list:
-            base = base.append(tmp, ignore_index=True)
-
-        # index reset
-        base.reset_index(drop=True, inplace=True)
+        # file들 다 채우면 통합할 일만 남았다(concat 한 번)
+        base = collect_pages(dataframe_list)
 
         # save csv file
         csv_filename = f"{os.path.join(csv_data_path, folder_name)}1.csv"
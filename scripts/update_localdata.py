@@ -1,28 +1,52 @@
 """
 - Update Localdata to request API
 - period : per day
+- run : python scripts/update_localdata.py --rate 2 --burst 4 --workers 4
+- --async : every page of every service in one asyncio sweep(utils/async_load_data.py) before the DB update
 """
 
 import sys
 import os
 import warnings
+import argparse
 warnings.filterwarnings(action='ignore')
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
 import time
 import math
 from tqdm import tqdm
 
-from utils.load_data import RequestLocalData
+from utils.load_data import RequestData, RequestLocalData, collect_pages
+from utils.rate_limit import TokenBucket
 from utils.preprocess import LocalDataPreprocess
 from utils.db_connector import DBManagement
+from utils.snapshot import dump_facility_snapshot
+from utils.facility import facility_registry, sync_unified_table
+from utils.manage_response import invalidate_radius_cache
 
 current_file_path = os.path.abspath(__file__)
 root_path = os.path.dirname(os.path.dirname(current_file_path))
 
 
+def make_info(api_request: RequestData, service_name: str) -> dict:
+    return {'authKey': api_request.auth_key,
+            'resultType': 'json',
+            'lastModTsBgn' : api_request.start_date,
+            'lastModTsEnd' : api_request.end_date,
+            'pageIndex' : 1,
+            'pageSize': 500,
+            'opnSvcId': service_name}
+
+
 if __name__ == "__main__":
+    # API quota(requests per second, burst) and parallel page requests per service
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=RequestLocalData.default_rate)
+    parser.add_argument('--burst', type=int, default=RequestLocalData.default_burst)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--async', dest='use_async', action='store_true', help='fetch every service in one asyncio sweep')
+    parser.add_argument('--per-host', type=int, default=8, help='concurrent requests per host with --async')
+    args = parser.parse_args()
     
     # db connection
     db_info_path = os.path.join(root_path, 'secret_key', 'db_info.txt')
@@ -39,6 +63,10 @@ if __name__ == "__main__":
     localdata_table_df = dbm.set_table(localdata_table_path)
     localdata_table_columns = dbm.get_columns(localdata_table_df)
 
+    # updated kinds are copied again into the unified facility table
+    facility_table_path = os.path.join(root_path, "info", "schema", "facility_table.csv")
+    facility_table_df = dbm.set_table(facility_table_path)
+
     # excel_data_path
     excel_data_path = os.path.join(root_path, 'data', 'local_excel_data')
     csv_data_path = os.path.join(root_path, 'data', 'local_csv_data')
@@ -54,39 +82,46 @@ if __name__ == "__main__":
     # API 호출코드
 
     # request 객체
-    api_request = RequestLocalData(auth_key_local)
+    api_request = RequestLocalData(auth_key_local, limiter=TokenBucket(args.rate, args.burst), max_workers=args.workers)
+
+    # csv파일에 해당하는 서비스이름 파일 호출
+    service_names_dict = {folder_name: RequestLocalData.get_service_names(path=os.path.join(excel_data_path, folder_name))
+                          for folder_name in folder_names_list}
+
+    # --async: every service of every folder at once, the DB update below only reads the results
+    swept_dataframes = None
+    if args.use_async:
+        from utils.async_load_data import AsyncRequestLocalData
+        from utils.rate_limit import AsyncTokenBucket
+
+        async_request = AsyncRequestLocalData(auth_key_local, limiter=AsyncTokenBucket(args.rate, args.burst), per_host=args.per_host)
+        all_service_names = sorted({name for service_names in service_names_dict.values() for name in service_names})
+        swept_dataframes = dict(zip(all_service_names, async_request.sweep([make_info(async_request, name) for name in all_service_names])))
+        print(f"{len(all_service_names)}개 서비스 요청 완료: {async_request.http.status()}")
 
     for folder_name in folder_names_list:
-        
-        # csv파일에 해당하는 서비스이름 파일 호출
-        path = os.path.join(root_path, 'data', 'local_excel_data', folder_name)
-        service_names = RequestLocalData.get_service_names(path=path)
+        service_names = service_names_dict[folder_name]
 
         # 하나의 folder name에 서비스의 데이터가 있는 경우 count
         cnt = 0
-        service_dataframe = pd.DataFrame()
+        service_dataframes = []
         # 각 서비스별로 api 요청
         for service_name in service_names:
 
-            info = {'authKey': api_request.auth_key,
-                    'resultType': 'json',
-                    'lastModTsBgn' : api_request.start_date,
-                    'lastModTsEnd' : api_request.end_date,
-                    'pageIndex' : 1,
-                    'pageSize': 500,
-                    'opnSvcId': service_name}
-            
-            api_df = api_request.get_apidata(info=info)
+            if swept_dataframes is not None:
+                api_df = swept_dataframes[service_name]
+            else:
+                api_df = api_request.get_apidata(info=make_info(api_request, service_name))
             
             if api_df is None:
                 continue
 
             api_preprocess_df = LocalDataPreprocess.preprocess(api_df)
-            service_dataframe = service_dataframe.append(api_preprocess_df, ignore_index=True)
+            service_dataframes.append(api_preprocess_df)
             cnt += 1
-            
-            time.sleep(1.5)
         
+        service_dataframe = collect_pages(service_dataframes)
+
         # 한 데이터 자체가 비어있으면, 다음 인허가데이터로 넘어가기
         if len(service_dataframe) <= 0:
             print(f"{folder_name}에는 데이터가 없습니다.")
@@ -129,8 +164,19 @@ if __name__ == "__main__":
         
 
         print(f"갱신 후 전체 데이터 개수: {dbm.table_size(table_name)}")
+
+        # unified facility table
+        if table_name in facility_registry:
+            sync_unified_table(dbm, table_name, facility_table_df)
+
         print(f"{folder_name} 완료\n")
 
+    # 갱신이 끝나면 serving 쪽 cache 무효화
+    invalidate_radius_cache(dbm)
+
+    # memory-mapped facility snapshot for the serving workers
+    dump_facility_snapshot(dbm, os.path.join(root_path, 'data', 'facility_snapshot'))
+
     dbm.cursor.close()
 
 
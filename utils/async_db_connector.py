@@ -0,0 +1,53 @@
+import asyncio
+import aiomysql
+from typing import List, Tuple, Sequence, Optional
+
+from utils.db_connector import DBManagement
+
+
+class AsyncDBManagement:
+    """
+    Non-blocking counterpart of DBManagement for the ASGI app(asgi_app.py)
+    - one aiomysql pool per process, sized by pool_size in secret_key/db_info.txt
+    """
+    pool = None
+    _pool_lock = asyncio.Lock()
+
+    @classmethod
+    async def init_pool(cls, path: str) -> aiomysql.Pool:
+        async with cls._pool_lock:
+            if cls.pool is None:
+                db_info_dict = DBManagement.get_db_info(path)
+                pool_size = int(db_info_dict.get('pool_size', 20))
+
+                cls.pool = await aiomysql.create_pool(host=db_info_dict['host'],
+                                                      user=db_info_dict['user'],
+                                                      password=db_info_dict['password'],
+                                                      db=db_info_dict['database'],
+                                                      minsize=1,
+                                                      maxsize=pool_size,
+                                                      pool_recycle=int(float(db_info_dict.get('pool_recycle', 60))),
+                                                      autocommit=True)
+                print(f'MySQL {db_info_dict["database"]} async connection pool 생성 (pool_size={pool_size})')
+
+        return cls.pool
+
+    @classmethod
+    async def fetchall(cls, path: str, query: str, params: Optional[Sequence] = None) -> List[Tuple]:
+        """
+        Run one query on a pooled connection without blocking the event loop
+        - params are bound to the %s placeholders by aiomysql(escaped, not server-side prepared)
+        """
+        pool = cls.pool if cls.pool is not None else await cls.init_pool(path)
+
+        async with pool.acquire() as cnx:
+            async with cnx.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+
+    @classmethod
+    async def close_pool(cls) -> None:
+        if cls.pool is not None:
+            cls.pool.close()
+            await cls.pool.wait_closed()
+            cls.pool = None
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import pandas as pd
+
+from utils.http_client import RetryPolicy, should_retry
+from utils.load_data import (RequestData, RequestLocalData, EmptyDataFromResponse, collect_pages, localdata_period,
+                             localdata_total_count, localdata_remaining_pages, localdata_dataframe)
+from utils.rate_limit import AsyncTokenBucket
+
+
+class AsyncHttpClient(RetryPolicy):
+    """
+    Non-blocking counterpart of HttpClient(utils/http_client.py) for one event loop
+    - one aiohttp session, opened on the first request inside the running loop
+    - per_host: concurrent connections(so requests) per host, the only concurrency limit
+    - limiter: global rate limit of every request, whatever the host
+    - same timeouts as HttpClient, retries and stats of RetryPolicy
+    """
+
+    def __init__(self, limiter: AsyncTokenBucket, per_host: int = 8, connect_timeout: float = 3.05,
+                 read_timeout: float = 30.0, max_retries: int = 4, backoff: float = 0.5,
+                 max_backoff: float = 30.0, verify: bool = False) -> None:
+        super().__init__(max_retries, backoff, max_backoff)
+        self.limiter = limiter
+        self.per_host = per_host
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.verify = verify
+
+        self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            # requests beyond per_host wait for a free connection of the host
+            connector = aiohttp.TCPConnector(limit_per_host=self.per_host, ssl=None if self.verify else False)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def get_text(self, url: str, params: Dict = None) -> str:
+        """
+        GET with retries, raises aiohttp.ClientError / asyncio.TimeoutError when every attempt failed
+        """
+        host = urlparse(url).netloc
+        session = self._session()
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            self._count('requests')
+            try:
+                async with session.get(url, params=params) as response:
+                    body = await response.read()
+                    encoding = response.get_encoding()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                wait = self.retry_after_error(host, attempt, e)
+                if wait is None:
+                    raise
+            else:
+                wait = self.retry_after_response(host, attempt, response.status, body, response.headers.get('Retry-After'))
+                if wait is None:
+                    response.raise_for_status()
+                    # still a quota page on the last attempt
+                    if should_retry(response.status, body):
+                        raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status,
+                                                          message=self.quota_message(host, body))
+                    return body.decode(encoding, errors='replace')
+
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def get_json(self, url: str, params: Dict = None) -> Dict:
+        return json.loads(await self.get_text(url, params=params))
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class AsyncRequestLocalData(RequestData):
+    """
+    asyncio implementation of the Localdata client(request_api, get_apidata are coroutines)
+    - same API, paging and dataframe as RequestLocalData(helpers of utils/load_data.py)
+    - every page of every opnSvcId is requested on one event loop: a daily update is one concurrent sweep
+      (sweep) instead of one service after the other
+    - concurrency is bounded by per_host and the global rate limit, not by a worker pool
+    """
+
+    def __init__(self, auth_key: str, *args: tuple, limiter: AsyncTokenBucket = None, per_host: int = 8):
+        """
+        - args: (start_date, end_date) as YYYYMMDD, today when omitted
+        """
+        self.auth_key = auth_key
+        self.start_date, self.end_date = localdata_period(args)
+        self.limiter = limiter if limiter is not None else AsyncTokenBucket(RequestLocalData.default_rate, RequestLocalData.default_burst)
+        self.per_host = per_host
+        self.http = AsyncHttpClient(self.limiter, per_host=per_host)
+
+    async def request_api(self, params: Dict) -> Dict:
+        """
+        Get json data from Localdata API server
+        """
+        return await self.http.get_json(RequestLocalData.url, params=params)
+
+    async def get_page(self, info: Dict, page_index: int) -> pd.DataFrame:
+        response_dict = await self.request_api(params=dict(info, pageIndex=page_index))
+        return self.make_dataframe(response_dict)
+
+    async def get_apidata(self, info: Dict) -> Optional[pd.DataFrame]:
+        """
+        Every page of one opnSvcId(None when the period has no data)
+        - page 1 gives totalCount, the remaining pages are requested together
+        """
+        opnSvcId = info['opnSvcId']
+
+        response_dict = await self.request_api(params=info)
+        try:
+            total_data_count = localdata_total_count(response_dict)
+        except EmptyDataFromResponse:
+            print(f"{opnSvcId}서비스에는 {self.start_date}부터 {self.end_date}까지의 데이터가 없습니다")
+            return None
+
+        pages = await asyncio.gather(*[self.get_page(info, index) for index in localdata_remaining_pages(info, total_data_count)])
+
+        # gather keeps the page order
+        response_dataframe = collect_pages([self.make_dataframe(response_dict), *pages])
+
+        print(f"{opnSvcId}서비스의 {self.start_date}부터 {self.end_date}의 데이터를 성공적으로 다운받았습니다")
+        return response_dataframe
+
+    def make_dataframe(self, response_dict: Dict) -> pd.DataFrame:
+        return localdata_dataframe(response_dict)
+
+    async def get_apidata_many(self, infos: List[Dict]) -> List[Optional[pd.DataFrame]]:
+        try:
+            return await asyncio.gather(*[self.get_apidata(info) for info in infos])
+        finally:
+            await self.http.close()
+
+    def sweep(self, infos: List[Dict]) -> List[Optional[pd.DataFrame]]:
+        """
+        get_apidata of every info on a new event loop, results in the order of infos
+        """
+        return asyncio.run(self.get_apidata_many(infos))
@@ -0,0 +1,81 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+from utils.async_db_connector import AsyncDBManagement
+from utils.data_version import AsyncDataVersionWatcher
+from utils.facility import validate_facilities
+from utils.facility import get_facility
+from utils.scoring import AsyncScoreWeights
+from utils.manage_response import (db_info_path, build_radius_query, make_facility_body, find_hashtag, score_kinds,
+                                   page_offsets, build_page_queries, make_page_body, finish_page)
+
+
+async def fetch_data_version_async() -> int:
+    result = await AsyncDBManagement.fetchall(db_info_path, "SELECT version FROM data_version WHERE name = %s", ('facility',))
+    return result[0][0] if result else 0
+
+async def fetch_table_sizes_async(facilities: List[str]) -> Dict[str, int]:
+    tables = [get_facility(facility).table for facility in facilities]
+    results = await asyncio.gather(*[AsyncDBManagement.fetchall(db_info_path, f"SELECT COUNT(*) FROM {table}")
+                                     for table in tables])
+    return {facility: result[0][0] for facility, result in zip(facilities, results)}
+
+# data version and scoring weights of the ASGI app, same watcher/weights as utils/manage_response.py
+# with aiomysql fetches(the sync ones would block the event loop on the DB)
+data_version = AsyncDataVersionWatcher(fetch_data_version_async)
+score_weights = AsyncScoreWeights(fetch_table_sizes_async, score_kinds)
+data_version.subscribe(score_weights.refresh)
+
+
+# rds에서 주소에 대한 정보 가져오기(async)
+async def request_to_rds_async(facilities_type: List[str], lat: float, lon: float, radius_meter: int) -> List:
+    """
+    Same response as request_to_rds
+    - one query per facility table, issued concurrently on separate pooled connections
+    """
+    radius_query_list = [build_radius_query(facility, lat, lon, radius_meter)
+                         for facility in validate_facilities(facilities_type)]
+
+    results = await asyncio.gather(*[AsyncDBManagement.fetchall(db_info_path, radius_query + "ORDER BY distance;", params)
+                                     for radius_query, params in radius_query_list])
+    query_result = [row for result in results for row in result]
+
+    total_count, facility_body, flag_counts = make_facility_body(facilities_type, query_result)
+    hashtag_list = find_hashtag(facility_body, flag_counts)
+    response_list = [total_count, facility_body, hashtag_list]
+
+    return response_list
+
+async def request_to_rds_page_async(facilities_type: List[str], lat: float, lon: float, radius_meter: int,
+                                    summary: bool = False, limit: int = None, cursor: str = None) -> List:
+    """
+    Same response as request_to_rds_page(SQL path), raises ValueError for a broken cursor or a cursor without limit
+    - the aggregate and the page query are issued concurrently on separate pooled connections
+    """
+    validate_facilities(facilities_type)
+    offsets, page_types = page_offsets(facilities_type, limit, cursor)
+    count_query, page_query = build_page_queries(facilities_type, lat, lon, radius_meter, summary, limit, offsets, page_types)
+
+    lookups = [AsyncDBManagement.fetchall(db_info_path, *count_query)]
+    if page_query is not None:
+        lookups.append(AsyncDBManagement.fetchall(db_info_path, *page_query))
+    results = await asyncio.gather(*lookups)
+    count_result, page_result = results[0], (results[1] if page_query is not None else [])
+    total_count, facility_body, hashtag_list = make_page_body(facilities_type, count_result, page_result)
+
+    return finish_page(total_count, facility_body, hashtag_list, summary, limit, offsets, page_types)
+
+async def request_to_rds_many_async(facilities_type: List[str], locations: List[Tuple[float, float]], radius_meter: int,
+                                    summary: bool = False, limit: int = None, cursors: List[str] = None) -> List[List]:
+    """
+    request_to_rds_async for several locations at once
+    - with summary/limit/cursors every location goes through request_to_rds_page_async
+    """
+    if not summary and limit is None and not cursors:
+        lookups = [request_to_rds_async(facilities_type, lat, lon, radius_meter) for lat, lon in locations]
+    else:
+        cursors = cursors or [None] * len(locations)
+        lookups = [request_to_rds_page_async(facilities_type, lat, lon, radius_meter, summary, limit, cursor)
+                   for (lat, lon), cursor in zip(locations, cursors)]
+
+    return list(await asyncio.gather(*lookups))
@@ -0,0 +1,76 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Optional, Any
+
+
+class RadiusCache:
+    """
+    LRU + TTL cache of request_to_rds responses
+    - lat/lon are snapped to a grid cell of cell_size degrees, so nearby requests
+      (map pans) share one entry and are answered for the cell center
+    - key = (cell row, cell col, radius, sorted facilities_type)
+    """
+
+    # 0.0005 degree = about 55m(lat) x 45m(lon) in Korea
+    def __init__(self, max_size: int = 4096, ttl: float = 300.0, cell_size: float = 0.0005) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cell_size = cell_size
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'invalidations': 0}
+
+    def make_key(self, facilities_type: List[str], lat: float, lon: float, radius_meter: int) -> Tuple:
+        row = math.floor(lat / self.cell_size)
+        col = math.floor(lon / self.cell_size)
+        return row, col, radius_meter, tuple(sorted(set(facilities_type)))
+
+    def cell_center(self, key: Tuple) -> Tuple[float, float]:
+        row, col = key[0], key[1]
+        return round((row + 0.5) * self.cell_size, 7), round((col + 0.5) * self.cell_size, 7)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, *args) -> None:
+        """
+        Drop every entry(called when the data version changes)
+        """
+        with self._lock:
+            self._entries.clear()
+            self.stats['invalidations'] += 1
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            status = dict(self.stats)
+            status['size'] = len(self._entries)
+        status['max_size'] = self.max_size
+        return status
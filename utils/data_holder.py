@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class DoubleBuffer:
+    """
+    In-process serving data(e.g. the SpatialIndex) rebuilt in the background
+    - get() returns the current copy, a request keeps using the copy it got even after a swap
+    - refresh(version) is a DataVersionWatcher listener: it only starts a background rebuild,
+      the new copy replaces the reference in one assignment when it is complete
+    - a failed rebuild keeps the old copy and is retried every retry_interval seconds(max_retries times)
+    """
+
+    def __init__(self, build: Callable[[Optional[int]], Any], name: str,
+                 retry_interval: float = 30.0, max_retries: int = 10) -> None:
+        self.build = build
+        self.name = name
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self.listeners: List[Callable[[int], None]] = []
+
+        self.current = None
+        self.version = None
+        self.target = None
+        self.building = False
+        self._lock = threading.Lock()
+
+        self.stats = {'swaps': 0, 'failures': 0, 'build_seconds': 0.0}
+
+    def get(self) -> Any:
+        return self.current
+
+    def subscribe(self, listener: Callable[[int], None]) -> None:
+        """
+        listener(version) is called after every swap
+        """
+        self.listeners.append(listener)
+
+    def load(self, version: Optional[int] = None) -> Any:
+        """
+        Synchronous first build(startup)
+        """
+        self._swap(self._build(version), version)
+        return self.current
+
+    def refresh(self, version: int) -> None:
+        with self._lock:
+            self.target = version
+            if self.building:
+                # the running rebuild picks the newest target up when it finishes
+                return
+            self.building = True
+
+        threading.Thread(target=self._run, name=f'{self.name}_reload', daemon=True).start()
+
+    def _build(self, version: Optional[int]) -> Any:
+        start = time.perf_counter()
+        data = self.build(version)
+        self.stats['build_seconds'] = round(time.perf_counter() - start, 3)
+        return data
+
+    def _swap(self, data: Any, version: Optional[int]) -> None:
+        self.current = data
+        self.version = version
+        self.stats['swaps'] += 1
+
+        for listener in self.listeners:
+            listener(version)
+
+    def _run(self) -> None:
+        retries = 0
+        while True:
+            with self._lock:
+                target = self.target
+
+            try:
+                data = self._build(target)
+            except Exception as e:
+                self.stats['failures'] += 1
+                print(f"{self.name} 갱신 실패({retries + 1}/{self.max_retries}): {e}")
+                retries += 1
+                if retries < self.max_retries:
+                    time.sleep(self.retry_interval)
+                    continue
+            else:
+                self._swap(data, target)
+                retries = 0
+                print(f"{self.name} 갱신 완료: version {target} ({self.stats['build_seconds']}s)")
+
+            with self._lock:
+                if self.target == target:
+                    self.building = False
+                    return
+            # a newer version arrived during the build
+            retries = 0
+
+    def status(self) -> Dict:
+        status = dict(self.stats)
+        status.update({'version': self.version, 'target': self.target, 'building': self.building})
+        return status
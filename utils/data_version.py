@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, List
+
+
+class DataVersionWatcher:
+    """
+    Watch the data_version row written by the build/update scripts
+    - the row is read at most once per check_interval seconds
+    - listeners are called with the new version when it changes
+    """
+
+    def __init__(self, fetch_version: Callable[[], int], check_interval: float = 30.0) -> None:
+        self.fetch_version = fetch_version
+        self.check_interval = check_interval
+        self.listeners: List[Callable[[int], None]] = []
+
+        self.version = None
+        self.checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[int], None]) -> None:
+        self.listeners.append(listener)
+
+    def due(self, force: bool = False) -> bool:
+        return force or time.monotonic() - self.checked_at >= self.check_interval
+
+    def record(self, version: int) -> None:
+        """
+        Keep the polled version, listeners are called when it changed
+        """
+        if version != self.version:
+            previous, self.version = self.version, version
+            # the first read only records the version
+            if previous is not None:
+                for listener in self.listeners:
+                    listener(version)
+
+    def check(self, force: bool = False) -> int:
+        """
+        Return the current data version, polling the DB when the interval has passed
+        """
+        if not self.due(force):
+            return self.version
+
+        # only one thread polls, the others keep using the known version
+        if not self._lock.acquire(blocking=force):
+            return self.version
+
+        try:
+            self.checked_at = time.monotonic()
+            try:
+                version = self.fetch_version()
+            except Exception as e:
+                print(f"data version 조회 실패: {e}")
+                return self.version
+
+            self.record(version)
+        finally:
+            self._lock.release()
+
+        return self.version
+
+
+class AsyncDataVersionWatcher(DataVersionWatcher):
+    """
+    DataVersionWatcher for coroutines on one event loop(utils/async_manage_response.py)
+    - fetch_version is a coroutine function, await check() instead of blocking the loop on the DB
+    """
+
+    def __init__(self, fetch_version: Callable[[], Awaitable[int]], check_interval: float = 30.0) -> None:
+        super().__init__(fetch_version, check_interval)
+        # held across the fetch, a threading.Lock would block the loop
+        self._lock = asyncio.Lock()
+
+    async def check(self, force: bool = False) -> int:
+        # only one coroutine polls, the others keep using the known version
+        if not self.due(force) or self._lock.locked():
+            return self.version
+
+        async with self._lock:
+            self.checked_at = time.monotonic()
+            try:
+                version = await self.fetch_version()
+            except Exception as e:
+                print(f"data version 조회 실패: {e}")
+                return self.version
+
+            self.record(version)
+
+        return self.version
@@ -1,20 +1,221 @@
 import mysql.connector
 import pandas as pd
-from typing import List, Dict
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Iterator, Optional, Sequence, Tuple
 from tqdm import tqdm
+from utils.metrics import metrics
+
+
+# Exception for pool exhaustion(every connection is checked out)
+class PoolExhausted(Exception):
+    def __init__(self, pool_size: int, timeout: float):
+        super().__init__(f'{timeout}초 동안 사용 가능한 DB connection이 없습니다 (pool_size={pool_size})')
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of long-lived MySQL connections
+    - pool_size: maximum number of open connections
+    - pool_timeout: seconds to wait for a free connection at checkout
+    - pool_recycle: idle seconds after which a connection is pinged before reuse
+    """
+
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 pool_size: int = 5, pool_timeout: float = 3.0, pool_recycle: float = 60.0) -> None:
+        self.connection_info = {'host': host, 'user': user, 'password': password, 'database': database}
+        self.pool_size = int(pool_size)
+        self.pool_timeout = float(pool_timeout)
+        self.pool_recycle = float(pool_recycle)
+
+        # idle connections with the time they were returned, LIFO to reuse warm connections first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+
+        self.stats = {'created': 0, 'checkouts': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0, 'discarded': 0}
+        self.in_use = 0
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def _connect(self) -> mysql.connector.MySQLConnection:
+        # autocommit so that a long-lived connection never keeps an old read snapshot
+        cnx = mysql.connector.connect(**self.connection_info, autocommit=True)
+        self._count('created')
+        return cnx
+
+    def checkout(self) -> mysql.connector.MySQLConnection:
+        # fast path first, then wait up to pool_timeout for a connection to be returned
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            if not self._slots.acquire(timeout=self.pool_timeout):
+                self._count('timeouts')
+                raise PoolExhausted(self.pool_size, self.pool_timeout)
+
+        try:
+            try:
+                cnx, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                cnx = self._connect()
+            else:
+                # health check only for connections idle long enough to be dropped by the server
+                # (no silent reconnect: a new session would lose the prepared statements of this connection)
+                if time.monotonic() - returned_at > self.pool_recycle:
+                    try:
+                        cnx.ping(reconnect=False)
+                    except mysql.connector.Error:
+                        self._close(cnx)
+                        cnx = self._connect()
+                        self._count('reconnects')
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.in_use += 1
+        return cnx
+
+    def checkin(self, cnx: mysql.connector.MySQLConnection, discard: bool = False) -> None:
+        # no is_connected() here: it pings the server on every request,
+        # borrow() passes discard on errors and checkout() pings connections idle for pool_recycle
+        if discard:
+            self._close(cnx)
+            self._count('discarded')
+        else:
+            self._idle.put((cnx, time.monotonic()))
+
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _close(cnx: mysql.connector.MySQLConnection) -> None:
+        try:
+            cnx.close()
+        except mysql.connector.Error:
+            pass
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            status = dict(self.stats)
+            status['in_use'] = self.in_use
+        status['idle'] = self._idle.qsize()
+        status['pool_size'] = self.pool_size
+        return status
+
+    def close(self) -> None:
+        while True:
+            try:
+                cnx, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(cnx)
+
 
 class DBManagement:
-    def __init__(self, host: str, user: str, password: str, database: str) -> None:
+    # optional keys in secret_key/db_info.txt which only configure the pool
+    pool_keys = ('pool_size', 'pool_timeout', 'pool_recycle')
+
+    # process-wide pool shared by the serving code(app.py)
+    pool = None
+    _pool_lock = threading.Lock()
+
+    # prepared statements kept per connection(LRU), far below the server max_prepared_stmt_count
+    max_prepared_statements = 128
+
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 cnx: Optional[mysql.connector.MySQLConnection] = None, **pool_options) -> None:
         self.host = host
         self.user = user
         self.password = password
         self.database = database
-        self.cnx = mysql.connector.connect(host=self.host,
-                                    user=self.user,
-                                    password=self.password,
-                                    database=self.database)
+
+        # borrowed connection from the pool, or a dedicated one for the build/update scripts
+        if cnx is None:
+            cnx = mysql.connector.connect(host=self.host,
+                                        user=self.user,
+                                        password=self.password,
+                                        database=self.database)
+        self.cnx = cnx
         self.cursor = self.cnx.cursor()
+
+    @classmethod
+    def init_pool(cls, path: str) -> ConnectionPool:
+        """
+        Create the process-wide pool once from secret_key/db_info.txt
+        """
+        with cls._pool_lock:
+            if cls.pool is None:
+                with metrics.stage('db_info'):
+                    db_info_dict = cls.get_db_info(path)
+                cls.pool = ConnectionPool(**db_info_dict)
+                print(f'MySQL {db_info_dict["database"]} connection pool 생성 (pool_size={cls.pool.pool_size})')
+
+        return cls.pool
+
+    @classmethod
+    @contextmanager
+    def borrow(cls, path: str) -> Iterator['DBManagement']:
+        """
+        Borrow a pooled connection for the duration of the with block
+        """
+        pool = cls.pool if cls.pool is not None else cls.init_pool(path)
+        with metrics.stage('connect'):
+            cnx = pool.checkout()
+        dbm = cls(**pool.connection_info, cnx=cnx)
+        broken = False
+
+        try:
+            yield dbm
+        except mysql.connector.Error:
+            # the connection may be in an unknown state, do not hand it out again
+            broken = True
+            raise
+        finally:
+            try:
+                dbm.cursor.close()
+            except mysql.connector.Error:
+                broken = True
+            pool.checkin(cnx, discard=broken)
     
+    def execute_prepared(self, query: str, params: Sequence) -> List[Tuple]:
+        """
+        Run a parameterized(%s) statement and fetch every row
+        - the statement is prepared once per connection and re-executed with new params afterwards
+        """
+        statements = getattr(self.cnx, 'prepared_statements', None)
+        if statements is None:
+            statements = OrderedDict()
+            self.cnx.prepared_statements = statements
+
+        # the cursor re-prepares unless it gets the very same str object it executed last
+        # (MySQLCursorPrepared compares by identity), so the first str of each statement is kept with it
+        entry = statements.get(query)
+        if entry is None:
+            entry = (query, self.cnx.cursor(prepared=True))
+            statements[query] = entry
+            if len(statements) > self.max_prepared_statements:
+                _, (_, oldest) = statements.popitem(last=False)
+                oldest.close()
+        else:
+            statements.move_to_end(query)
+        query, cursor = entry
+
+        start = time.perf_counter()
+        with metrics.stage('sql'):
+            cursor.execute(query, tuple(params))
+        with metrics.stage('fetchall'):
+            rows = cursor.fetchall()
+        metrics.slow_query(query, params, time.perf_counter() - start)
+
+        return rows
+
     @staticmethod
     # bring db info in local text file(secret_key/db_info.txt)
     def get_db_info(path: str) -> Dict['str','str']:
@@ -46,6 +247,10 @@ class DBManagement:
         return table_df['Columns']
 
 
+    def has_table(self, table_name: str) -> bool:
+        self.cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
+        return bool(self.cursor.fetchall())
+
     def create_table(self, table_name: str, table: pd.DataFrame) -> None:
         # Check if the table exists
         self.cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
@@ -124,6 +329,23 @@ class DBManagement:
         self.cursor.execute(delete_query)
 
 
+    # Replace every row of one kind with the result of select_query in one transaction
+    ## readers see either the old or the new rows of the kind
+    def replace_kind_rows(self, table_name: str, kind: str, columns: List[str], select_query: str) -> None:
+        self.cursor.execute(f"DELETE FROM {table_name} WHERE kind = %s", (kind,))
+        self.cursor.execute(f"INSERT INTO {table_name} ({', '.join(columns)}) {select_query}")
+        self.commit()
+
+    # Add a column to an existing table if it is not there yet
+    def add_column(self, table_name: str, column: str, definition: str, after: str) -> bool:
+        self.cursor.execute(f"SHOW COLUMNS FROM {table_name} LIKE '{column}'")
+        if self.cursor.fetchall():
+            return False
+
+        self.cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {definition} AFTER {after}")
+        self.commit()
+        return True
+
     def create_spatial_index(self, table_name: str, coordinates_column: str) -> None:
 
                              
@@ -145,6 +367,34 @@ class DBManagement:
         return result
 
 
+    # data version row bumped after every build/update, watched by the serving caches
+    def create_version_table(self) -> None:
+        create_query = """
+                    CREATE TABLE IF NOT EXISTS data_version (
+                    name VARCHAR(40) NOT NULL,
+                    version INT UNSIGNED NOT NULL DEFAULT 0,
+                    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    PRIMARY KEY(name)
+                    );
+                    """
+        self.cursor.execute(create_query)
+        self.commit()
+
+    def bump_data_version(self, name: str = 'facility') -> None:
+        self.create_version_table()
+        bump_query = """
+                    INSERT INTO data_version (name, version) VALUES (%s, 1)
+                    ON DUPLICATE KEY UPDATE version = version + 1;
+                    """
+        self.cursor.execute(bump_query, (name,))
+        self.commit()
+
+    def get_data_version(self, name: str = 'facility') -> int:
+        self.cursor.execute("SELECT version FROM data_version WHERE name = %s", (name,))
+        result = self.cursor.fetchall()
+
+        return result[0][0] if result else 0
+
     def commit(self) -> None:
         self.cnx.commit()
 
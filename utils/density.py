@@ -0,0 +1,190 @@
+import json
+import os
+import numpy as np
+from typing import List, Dict, Tuple, Iterable
+
+from utils.spatial_index import EARTH_RADIUS, METER_PER_DEGREE, bounding_box
+from utils.hashtag import hashtag_rules, KeywordRule
+
+
+# Korea bounding box(lat_min, lon_min, lat_max, lon_max)
+korea_bbox = (33.1, 124.59, 38.7, 131.88)
+
+
+def flag_layers() -> List[Tuple[str, str]]:
+    """
+    (facility, flag) pairs used by the keyword hashtag rules, one extra count layer each
+    """
+    return [(rule.facility, rule.flag) for rule in hashtag_rules if isinstance(rule, KeywordRule)]
+
+
+def layer_name(facility: str, flag: str = None) -> str:
+    return facility if flag is None else f"{facility}.{flag}"
+
+
+class DensityGrid:
+    """
+    Regular lat/lon grid over a bounding box
+    - cell_meter is the cell height, the cell width is cell_meter at the center latitude of the box
+    """
+
+    def __init__(self, bbox: Tuple[float, float, float, float] = korea_bbox, cell_meter: float = 50.0) -> None:
+        self.bbox = tuple(float(value) for value in bbox)
+        self.cell_meter = float(cell_meter)
+
+        lat_min, lon_min, lat_max, lon_max = self.bbox
+        self.cell_lat = self.cell_meter / METER_PER_DEGREE
+        self.cell_lon = self.cell_meter / (METER_PER_DEGREE * np.cos(np.radians((lat_min + lat_max) / 2)))
+        self.n_rows = int(np.ceil((lat_max - lat_min) / self.cell_lat))
+        self.n_cols = int(np.ceil((lon_max - lon_min) / self.cell_lon))
+
+    def error_margin(self) -> float:
+        """
+        Half of the largest cell diagonal(meter), the widest cell is at the south edge
+        """
+        widest = self.cell_lon * METER_PER_DEGREE * np.cos(np.radians(self.bbox[0]))
+        return float(np.hypot(self.cell_meter, widest) / 2)
+
+    def cell_center(self, row: np.ndarray, col: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return (self.bbox[0] + (np.asarray(row) + 0.5) * self.cell_lat,
+                self.bbox[1] + (np.asarray(col) + 0.5) * self.cell_lon)
+
+    def cell_index(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, cols) of the points inside the box, points outside are dropped
+        """
+        lat = np.asarray(lat, dtype='float64')
+        lon = np.asarray(lon, dtype='float64')
+        rows = np.floor((lat - self.bbox[0]) / self.cell_lat).astype('int64')
+        cols = np.floor((lon - self.bbox[1]) / self.cell_lon).astype('int64')
+
+        inside = (rows >= 0) & (rows < self.n_rows) & (cols >= 0) & (cols < self.n_cols)
+        return rows[inside], cols[inside]
+
+    def to_dict(self) -> Dict:
+        return {'bbox': list(self.bbox), 'cell_meter': self.cell_meter}
+
+
+def build_layer(path: str, grid: DensityGrid, lat: np.ndarray, lon: np.ndarray, block_rows: int = 512) -> int:
+    """
+    Write one row-cumulative count layer as .npy
+    - shape (n_rows, n_cols + 1), layer[row, c] = number of places in the cells 0..c-1 of the row
+    - filled block by block so that the full count grid is never in memory
+    - returns the number of places in the box
+    """
+    rows, cols = grid.cell_index(lat, lon)
+    flat = np.sort(rows * grid.n_cols + cols)
+
+    # a row total decides the dtype(cumulative sums never exceed it)
+    row_max = int(np.bincount(rows, minlength=grid.n_rows).max()) if len(rows) else 0
+    dtype = 'uint16' if row_max <= np.iinfo('uint16').max else 'uint32'
+
+    layer = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(grid.n_rows, grid.n_cols + 1))
+    for start in range(0, grid.n_rows, block_rows):
+        stop = min(start + block_rows, grid.n_rows)
+        lo, hi = np.searchsorted(flat, [start * grid.n_cols, stop * grid.n_cols])
+
+        counts = np.bincount(flat[lo:hi] - start * grid.n_cols, minlength=(stop - start) * grid.n_cols)
+        layer[start:stop, 0] = 0
+        layer[start:stop, 1:] = np.cumsum(counts.reshape(stop - start, grid.n_cols), axis=1)
+
+    layer.flush()
+    del layer
+    return len(flat)
+
+
+def build_tiles(out_dir: str, layers: Iterable[Tuple[str, np.ndarray, np.ndarray]], grid: DensityGrid) -> Dict:
+    """
+    Write every layer(name, lat, lon) and meta.json into out_dir
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    meta = {'grid': grid.to_dict(), 'layers': {}}
+
+    for name, lat, lon in layers:
+        file_name = f"{name}.npy"
+        size = build_layer(os.path.join(out_dir, file_name), grid, lat, lon)
+        meta['layers'][name] = {'file': file_name, 'size': size}
+        print(f"density layer {name}: {size}")
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+class DensityTiles:
+    """
+    Approximate radius counts from the layers written by scripts/build_density_tiles.py
+    - a place is counted when the center of its cell is within the radius
+    - one slice per grid row crossed by the circle: O(radius / cell_meter), whatever the number of places
+    - error bound: with h = error_margin()(about 36m for 50m cells), only places whose exact distance d
+      satisfies radius - h <= d < radius + h can be misclassified, so
+      |count - exact count(radius SQL)| <= number of places in that ring
+    - a snapshot: rebuild the tiles after the build/update scripts to follow the data
+    - only places inside the box are counted: check covers() first, a circle crossing the box edge
+      would get a confident undercount(0 far outside)
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+
+        self.path = path
+        self.grid = DensityGrid(**meta['grid'])
+        self.layers = {name: np.load(os.path.join(path, info['file']), mmap_mode='r')
+                       for name, info in meta['layers'].items()}
+        # number of places of each layer inside the box
+        self.sizes = {name: info['size'] for name, info in meta['layers'].items()}
+
+    def has_layer(self, name: str) -> bool:
+        return name in self.layers
+
+    def error_margin(self) -> float:
+        return self.grid.error_margin()
+
+    def covers(self, lat: float, lon: float, radius_meter: float) -> bool:
+        """
+        The whole circle is inside the box of the tiles
+        """
+        lat_min, lon_min, lat_max, lon_max = bounding_box(lat, lon, radius_meter)
+        box_lat_min, box_lon_min, box_lat_max, box_lon_max = self.grid.bbox
+        return box_lat_min <= lat_min and box_lon_min <= lon_min and lat_max <= box_lat_max and lon_max <= box_lon_max
+
+    def row_spans(self, lat: float, lon: float, radius_meter: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (rows, first col, last col + 1) of the cells whose center is within the radius
+        """
+        grid = self.grid
+        lat_min, lon_min = grid.bbox[0], grid.bbox[1]
+        angle = radius_meter / EARTH_RADIUS
+        d_lat = np.degrees(angle)
+
+        row_lo = max(int(np.ceil((lat - d_lat - lat_min) / grid.cell_lat - 0.5)), 0)
+        row_hi = min(int(np.floor((lat + d_lat - lat_min) / grid.cell_lat - 0.5)), grid.n_rows - 1)
+        rows = np.arange(row_lo, row_hi + 1)
+
+        # longitude half width of the circle on each row center(spherical law of cosines)
+        phi, row_phi = np.radians(lat), np.radians(lat_min + (rows + 0.5) * grid.cell_lat)
+        cos_d_lon = (np.cos(angle) - np.sin(phi) * np.sin(row_phi)) / (np.cos(phi) * np.cos(row_phi))
+        crossed = cos_d_lon <= 1.0
+        rows = rows[crossed]
+        d_lon = np.degrees(np.arccos(np.clip(cos_d_lon[crossed], -1.0, 1.0)))
+
+        col_lo = np.maximum(np.ceil((lon - d_lon - lon_min) / grid.cell_lon - 0.5).astype('int64'), 0)
+        col_hi = np.minimum(np.floor((lon + d_lon - lon_min) / grid.cell_lon - 0.5).astype('int64'), grid.n_cols - 1)
+
+        return rows, col_lo, col_hi + 1
+
+    def count(self, name: str, lat: float, lon: float, radius_meter: float) -> int:
+        return self.counts([name], lat, lon, radius_meter)[name]
+
+    def counts(self, names: List[str], lat: float, lon: float, radius_meter: float) -> Dict[str, int]:
+        rows, col_lo, col_end = self.row_spans(lat, lon, radius_meter)
+        valid = col_lo < col_end
+        rows, col_lo, col_end = rows[valid], col_lo[valid], col_end[valid]
+
+        counts = {}
+        for name in names:
+            layer = self.layers[name]
+            counts[name] = int(layer[rows, col_end].astype('int64').sum() - layer[rows, col_lo].astype('int64').sum())
+        return counts
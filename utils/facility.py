@@ -0,0 +1,100 @@
+from typing import List, Optional, Tuple
+
+from utils.hashtag import feature_flags
+
+
+# Exception for facility kinds which are not in the registry
+class UnknownFacility(ValueError):
+    def __init__(self, facilities: List[str]):
+        super().__init__(f'지원하지 않는 facilities_type 입니다: {", ".join(facilities)}')
+        self.facilities = facilities
+
+
+class Facility:
+    """
+    How one facility kind is stored
+    - table: MySQL table name
+    - name_column, address_column: columns answered as name/address(address None = NULL)
+    - extra_columns: per-row feature flag columns(is_fitness, ...), 0 when the table has none
+    """
+
+    def __init__(self, kind: str, table: str, name_column: str, address_column: Optional[str],
+                 extra_columns: Tuple[str, ...] = ()) -> None:
+        self.kind = kind
+        self.table = table
+        self.name_column = name_column
+        self.address_column = address_column
+        self.extra_columns = extra_columns
+
+    def address_expression(self) -> str:
+        return self.address_column if self.address_column is not None else 'NULL'
+
+    def flag_expressions(self) -> List[str]:
+        return [flag if flag in self.extra_columns else '0' for flag in feature_flags]
+
+    def flag_columns(self) -> List[str]:
+        return [flag if expression == flag else f"{expression} AS {flag}"
+                for expression, flag in zip(self.flag_expressions(), feature_flags)]
+
+    def unified_select(self) -> str:
+        """
+        SELECT of this kind's rows in the unified_columns order
+        """
+        flag_column = ", ".join(self.flag_expressions())
+        return (f"SELECT '{self.kind}', {self.name_column}, {self.address_expression()}, lat, lon, {flag_column}, coordinates "
+                f"FROM {self.table}")
+
+
+localdata_flags = tuple(feature_flags)
+
+# facility kind => table(localdata tables are created per folder by scripts/build_localdata.py)
+facility_registry = {
+    'hospital': Facility('hospital', 'hospital', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'pharmacy': Facility('pharmacy', 'pharmacy', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'laundry': Facility('laundry', 'laundry', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'hair': Facility('hair', 'hair', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'gym': Facility('gym', 'gym', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'mart': Facility('mart', 'mart', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'convenience': Facility('convenience', 'convenience', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    'cafe': Facility('cafe', 'cafe', 'bplcNm', 'rdnWhlAddr', localdata_flags),
+    ## bus같은경우는 주소가 저장 안되어있으니 NULL
+    'bus': Facility('bus', 'bus', 'StationName', None),
+    'metro': Facility('metro', 'metro', 'StationName', 'roadAddress'),
+}
+
+
+# optional table with every kind in it(info/schema/facility_table.csv), one spatial index for any kind subset
+unified_table = 'facility'
+unified_columns = ['kind', 'name', 'address', 'lat', 'lon', *feature_flags, 'coordinates']
+
+
+def get_facility(kind: str) -> Facility:
+    try:
+        return facility_registry[kind]
+    except KeyError:
+        raise UnknownFacility([kind])
+
+
+def validate_facilities(facilities_type: List[str]) -> List[str]:
+    """
+    Reject unknown kinds before anything touches the DB
+    """
+    unknown = [facility for facility in facilities_type if facility not in facility_registry]
+    if unknown:
+        raise UnknownFacility(unknown)
+
+    return facilities_type
+
+
+def sync_unified_table(dbm, kind: str, table_df) -> None:
+    """
+    Copy the rows of one kind from its own table into the unified table
+    - called by the build/update scripts after the kind's table is committed
+    - the table and its spatial index are created on first use
+    """
+    if not dbm.has_table(unified_table):
+        dbm.create_table(unified_table, table_df)
+        dbm.create_spatial_index(unified_table, 'coordinates')
+        dbm.commit()
+
+    dbm.replace_kind_rows(unified_table, kind, unified_columns, get_facility(kind).unified_select())
@@ -0,0 +1,141 @@
+import re
+import numpy as np
+from abc import ABCMeta, abstractmethod
+from typing import List, Dict, Optional
+
+
+# 업체명 keyword patterns
+## LocalDataPreprocess stores one flag column per pattern at ingest time
+feature_flags = {
+    'is_fitness': '헬스|짐|gym|피트니스|휘트니스|fitness|PT|피티',
+    'is_coin_laundry': '코인|크린토피아|셀프|24',
+    'is_starbucks': '스타벅스',
+}
+
+
+class HashtagRule(metaclass=ABCMeta):
+    """
+    One hashtag rule over a facility_body
+    - group: rules sharing a group are exclusive, the first matching rule wins
+    - a rule without match or match_counts cannot be instantiated
+    """
+
+    def __init__(self, hashtag: str, facility: str, group: Optional[str] = None) -> None:
+        self.hashtag = hashtag
+        self.facility = facility
+        self.group = group
+
+    @abstractmethod
+    def match(self, facility_body: Dict, flag_counts: Optional[Dict] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def match_counts(self, counts: Dict[str, np.ndarray], flag_counts: Dict[str, Dict[str, np.ndarray]]) -> np.ndarray:
+        """
+        Vectorized match over many locations from count arrays only
+        """
+        pass
+
+
+class KeywordRule(HashtagRule):
+    """
+    At least one place name of the facility matches the feature flag pattern
+    - uses the precomputed flag counts when the rows came with flag columns
+    """
+
+    def __init__(self, hashtag: str, facility: str, flag: str, group: Optional[str] = None) -> None:
+        super().__init__(hashtag, facility, group)
+        self.flag = flag
+        self.matcher = re.compile(feature_flags[flag])
+
+    def match(self, facility_body: Dict, flag_counts: Optional[Dict] = None) -> bool:
+        if flag_counts is not None and self.facility in flag_counts:
+            return flag_counts[self.facility][self.flag] > 0
+
+        body = facility_body.get(self.facility)
+        if not body:
+            return False
+
+        search = self.matcher.search
+        return any(isinstance(place['name'], str) and search(place['name']) for place in body['place'])
+
+    def match_counts(self, counts: Dict[str, np.ndarray], flag_counts: Dict[str, Dict[str, np.ndarray]]) -> np.ndarray:
+        return np.asarray(flag_counts.get(self.facility, {}).get(self.flag, 0)) > 0
+
+
+class CountRule(HashtagRule):
+    """
+    The facility has at least threshold places
+    """
+
+    def __init__(self, hashtag: str, facility: str, threshold: int, group: Optional[str] = None) -> None:
+        super().__init__(hashtag, facility, group)
+        self.threshold = threshold
+
+    def match(self, facility_body: Dict, flag_counts: Optional[Dict] = None) -> bool:
+        body = facility_body.get(self.facility)
+        return body is not None and body['count'] >= self.threshold
+
+    def match_counts(self, counts: Dict[str, np.ndarray], flag_counts: Dict[str, Dict[str, np.ndarray]]) -> np.ndarray:
+        return np.asarray(counts.get(self.facility, 0)) >= self.threshold
+
+
+# 해시태그 규칙(순서대로 응답에 포함)
+hashtag_rules = [
+    KeywordRule('#헬스장', 'gym', 'is_fitness'),
+    KeywordRule('#코인빨래방', 'laundry', 'is_coin_laundry'),
+    CountRule('#마트/쇼핑몰', 'mart', 1),
+    CountRule('#편세권', 'convenience', 3),
+    KeywordRule('#스세권', 'cafe', 'is_starbucks'),
+    CountRule('#초역세권', 'metro', 3, group='metro'),
+    CountRule('#역세권', 'metro', 1, group='metro'),
+]
+
+
+class HashtagEngine:
+
+    def __init__(self, rules: List[HashtagRule]) -> None:
+        self.rules = rules
+
+    def find(self, facility_body: Dict, flag_counts: Optional[Dict] = None) -> List[str]:
+        """
+        flag_counts: {facility: {flag: number of flagged places}}, optional
+        """
+        hashtag_list = []
+        matched_groups = set()
+
+        for rule in self.rules:
+            if rule.group is not None and rule.group in matched_groups:
+                continue
+
+            if rule.match(facility_body, flag_counts):
+                hashtag_list.append(rule.hashtag)
+                if rule.group is not None:
+                    matched_groups.add(rule.group)
+
+        return hashtag_list
+
+    def find_mask(self, counts: Dict[str, np.ndarray], flag_counts: Dict[str, Dict[str, np.ndarray]]) -> np.ndarray:
+        """
+        find() for many locations at once, as a bitmask per location(bit i = rules[i])
+        - counts: {facility: count array}, flag_counts: {facility: {flag: count array}}
+        """
+        shape = np.broadcast(*[np.asarray(value) for value in counts.values()]).shape if counts else ()
+        mask = np.zeros(shape, dtype='uint32')
+        matched_groups = {}
+
+        for bit, rule in enumerate(self.rules):
+            matched = np.broadcast_to(rule.match_counts(counts, flag_counts), shape)
+            if rule.group is not None:
+                group_matched = matched_groups.get(rule.group, np.zeros(shape, dtype=bool))
+                matched = matched & ~group_matched
+                matched_groups[rule.group] = group_matched | matched
+            mask |= matched.astype('uint32') << bit
+
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        return [rule.hashtag for bit, rule in enumerate(self.rules) if int(mask) >> bit & 1]
+
+
+hashtag_engine = HashtagEngine(hashtag_rules)
@@ -0,0 +1,166 @@
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# statuses worth another try(rate limit, gateway, temporary server errors)
+retry_statuses = (429, 500, 502, 503, 504)
+
+# data.go.kr answers a quota error with 200 and an XML body instead of 429
+retry_body_markers = (b'LIMITED_NUMBER_OF_SERVICE_REQUESTS', b'SERVICE_TIMEOUT_ERROR', b'HTTP_ERROR')
+
+# quota pages are short XML documents, only the head of a body is scanned
+retry_scan_size = 2048
+
+
+def should_retry(status: int, body: bytes) -> bool:
+    """
+    Rate limit, gateway and temporary server errors, and data.go.kr quota pages
+    - body: raw response bytes, the ASCII markers are found without decoding a large page
+    """
+    if status in retry_statuses:
+        return True
+    if status != 200:
+        return False
+
+    head = body[:retry_scan_size]
+    return any(marker in head for marker in retry_body_markers)
+
+
+def backoff_seconds(attempt: int, backoff: float, max_backoff: float, retry_after: Optional[str] = None) -> float:
+    """
+    Exponential backoff with full jitter, at least Retry-After(capped by max_backoff) when the server sent one
+    """
+    seconds = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+    if retry_after is not None and retry_after.isdigit():
+        seconds = max(seconds, min(max_backoff, float(retry_after)))
+    return seconds
+
+
+class RetryPolicy:
+    """
+    Retry policy and stats shared by HttpClient and AsyncHttpClient(utils/async_load_data.py)
+    - connection errors, timeouts, retry_statuses and quota pages are retried max_retries times
+      with exponential backoff and full jitter(Retry-After is honored when it is longer)
+    - stats: requests(attempts sent), retries, failures(raised errors), bytes(response bodies)
+    - the clients send the requests and sleep, retry_after_error/retry_after_response decide how long
+    """
+
+    def __init__(self, max_retries: int = 4, backoff: float = 0.5, max_backoff: float = 30.0) -> None:
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'bytes': 0}
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def retry_after_error(self, host: str, attempt: int, error: Exception) -> Optional[float]:
+        """
+        Seconds to wait after a connection error or a timeout, None when the error is to be raised
+        """
+        if attempt >= self.max_retries:
+            self._count('failures')
+            return None
+        return self._backoff(host, attempt, str(error) or repr(error), None)
+
+    def retry_after_response(self, host: str, attempt: int, status: int, body: bytes,
+                             retry_after: Optional[str]) -> Optional[float]:
+        """
+        Seconds to wait after a response, None when it is final
+        - a final response is raised by the client when status >= 400 or it is still a quota page
+        """
+        self._count('bytes', len(body))
+        if not should_retry(status, body):
+            if status >= 400:
+                # 4xx other than 429: another try would get the same answer
+                self._count('failures')
+            return None
+
+        if attempt >= self.max_retries:
+            self._count('failures')
+            return None
+        return self._backoff(host, attempt, f'status {status}' if status != 200 else 'quota page', retry_after)
+
+    def _backoff(self, host: str, attempt: int, error: str, retry_after: Optional[str]) -> float:
+        wait = backoff_seconds(attempt, self.backoff, self.max_backoff, retry_after)
+        # only the host is printed: some APIs(Seoul bus) carry the auth key in the path
+        print(f"{host} 재시도 {attempt + 1}/{self.max_retries} ({error}), {wait:.1f}s 후")
+        self._count('retries')
+        return wait
+
+    @staticmethod
+    def quota_message(host: str, body: bytes) -> str:
+        return f'{host} 요청 한도 초과: {body[:200].decode(errors="replace")}'
+
+    def status(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+class HttpClient(RetryPolicy):
+    """
+    Shared HTTP layer of the RequestData clients(utils/load_data.py)
+    - one requests.Session: keep-alive connections pooled per host(pool_maxsize per host)
+    - (connect_timeout, read_timeout) on every request
+    - retries and stats of RetryPolicy
+    """
+
+    def __init__(self, pool_size: int = 16, connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 max_retries: int = 4, backoff: float = 0.5, max_backoff: float = 30.0, verify: bool = False) -> None:
+        super().__init__(max_retries, backoff, max_backoff)
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+
+        self.session = requests.Session()
+        # retries are done here(counted, quota pages included), not by urllib3
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url: str, params: Dict = None) -> requests.Response:
+        """
+        GET with retries, raises requests.RequestException when every attempt failed
+        """
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            self._count('requests')
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, verify=self.verify)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                wait = self.retry_after_error(host, attempt, e)
+                if wait is None:
+                    raise
+            else:
+                wait = self.retry_after_response(host, attempt, response.status_code, response.content,
+                                                 response.headers.get('Retry-After'))
+                if wait is None:
+                    response.raise_for_status()
+                    # still a quota page on the last attempt
+                    if should_retry(response.status_code, response.content):
+                        raise requests.HTTPError(self.quota_message(host, response.content), response=response)
+                    return response
+
+            time.sleep(wait)
+            attempt += 1
+
+    def get_json(self, url: str, params: Dict = None) -> Dict:
+        response = self.get(url, params=params)
+        return json.loads(response.text)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# process-wide client shared by every RequestData instance
+http_client = HttpClient()
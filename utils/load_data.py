@@ -2,23 +2,46 @@ import numpy as np
 import pandas as pd
 
 import os
-import requests
-import json
 
 import datetime
+import math
 from pytz import timezone
 import time
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Iterable, Iterator, Tuple
 from abc import *
 
+from utils.rate_limit import TokenBucket
+from utils.http_client import HttpClient, http_client
+
 
 # Exception for Empty Data
 class EmptyDataFromResponse(Exception):
     def __init__(self):
         super().__init__('해당 일자에 데이터가 없습니다.')
 
+# Exception for a crawl with failed requests(the finished part is checkpointed)
+class IncompleteCrawl(Exception):
+    def __init__(self, failed: List[str]):
+        self.failed = failed
+        super().__init__(f"{len(failed)}개 도시 수집 실패: {', '.join(failed)}")
+
+def collect_pages(pages: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    One concat of every page frame
+    - concat inside the page loop copies every previous row again on each page(O(n^2)),
+      the crawlers yield pages(iter_pages) and the rows are copied once here
+    """
+    page_list = [page for page in pages if len(page) > 0]
+    if len(page_list) == 0:
+        return pd.DataFrame()
+    return pd.concat(page_list, ignore_index=True)
+
 # Interface
 class RequestData(metaclass=ABCMeta):
+
+    # pooled session with timeouts and retries(utils/http_client.py), replace per instance to use another client
+    http: HttpClient = http_client
     
     # @abstractmethod
     # def get_csvdata(self, path: str, sep: str =',') -> pd.DataFrame:
@@ -47,19 +70,58 @@ class RequestData(metaclass=ABCMeta):
     #     pass
 
 
+# Localdata API helpers shared by RequestLocalData and AsyncRequestLocalData(utils/async_load_data.py)
+def localdata_period(args: tuple) -> Tuple[str, str]:
+    """
+    (start_date, end_date) as YYYYMMDD, today when omitted
+    """
+    if len(args)<2:
+        today = datetime.datetime.now(timezone('Asia/Seoul')).strftime("%Y%m%d")
+        return today, today
+    return args[0], args[1]
+
+def localdata_total_count(response_dict: Dict) -> int:
+    """
+    totalCount of the first page, raises EmptyDataFromResponse when the period has no data
+    """
+    try:
+        total_data_count = response_dict['result']['header']['paging']['totalCount']
+    except (KeyError, TypeError):
+        raise EmptyDataFromResponse
+    if total_data_count < 1:
+        raise EmptyDataFromResponse
+    return total_data_count
+
+def localdata_remaining_pages(info: Dict, total_data_count: int) -> range:
+    """
+    Page indexes after info['pageIndex'], all known from totalCount
+    """
+    page_index = info['pageIndex']
+    last_page = page_index + math.ceil(total_data_count / info['pageSize']) - 1
+    return range(page_index + 1, last_page + 1)
+
+def localdata_dataframe(response_dict: Dict) -> pd.DataFrame:
+    return pd.json_normalize(response_dict['result']['body']['rows'][0]['row'])
+
+
 class RequestLocalData(RequestData):
 
     url = "http://www.localdata.go.kr/platform/rest/TO0/openDataApi"
 
-    def __init__(self, auth_key: str, *args: tuple):
-        self.auth_key = auth_key
+    # API quota: requests per second and burst of the shared token bucket
+    default_rate = 2.0
+    default_burst = 4
 
-        if len(args)<2:
-            self.start_date = datetime.datetime.now(timezone('Asia/Seoul')).strftime("%Y%m%d")
-            self.end_date = datetime.datetime.now(timezone('Asia/Seoul')).strftime("%Y%m%d")
-        else:
-            self.start_date = args[0]
-            self.end_date = args[1]
+    def __init__(self, auth_key: str, *args: tuple, limiter: TokenBucket = None, max_workers: int = 4):
+        """
+        - args: (start_date, end_date) as YYYYMMDD, today when omitted
+        - limiter: token bucket every page request waits on(shared with other clients of the same API)
+        - max_workers: pages fetched in parallel once totalCount is known
+        """
+        self.auth_key = auth_key
+        self.limiter = limiter if limiter is not None else TokenBucket(self.default_rate, self.default_burst)
+        self.max_workers = max_workers
+        self.start_date, self.end_date = localdata_period(args)
     
     @staticmethod
     def get_folder_names(path: str) -> List[str]:
@@ -104,60 +166,58 @@ class RequestLocalData(RequestData):
         Get json data from Localdata API server
         """
 
-        # Request Localdata API server and get response
-        response = requests.get(RequestLocalData.url, params=params, verify=False)
-        response_text = response.text
+        # wait for the rate limiter instead of sleeping between pages
+        self.limiter.acquire()
 
-        # Need Exception handling when request data from API server(404, 500)
-
-        # text to json
-        response_dict = json.loads(response_text)
+        # Request Localdata API server(timeouts, 5xx and quota pages are retried by the client)
+        response_dict = self.http.get_json(RequestLocalData.url, params=params)
         return response_dict
-    
-    def get_apidata(self, info: Dict) -> pd.DataFrame:
-        
-        page_index = info['pageIndex']
-        page_size = info['pageSize']
-        opnSvcId = info['opnSvcId']
 
+    def get_page(self, info: Dict, page_index: int) -> pd.DataFrame:
+        # each worker gets its own params(info is shared)
+        response_dict = self.request_api(params=dict(info, pageIndex=page_index))
+        return self.make_dataframe(response_dict)
+    
+    def iter_pages(self, info: Dict) -> Iterator[pd.DataFrame]:
+        """
+        Page frames of one opnSvcId in page order
+        - page 1 gives totalCount, the remaining pages are fetched by max_workers threads under the limiter
+        - raises EmptyDataFromResponse when the period has no data
+        """
         # Request API server
         response_dict = self.request_api(params=info)
-        
+
         # Count total to get info how many data are to be changed
+        total_data_count = localdata_total_count(response_dict)
+
+        # Make fundamental dataFrame
+        yield self.make_dataframe(response_dict)
+
+        # every remaining page index is known from totalCount
+        page_indexes = localdata_remaining_pages(info, total_data_count)
+
+        # map() keeps the page order whatever order the pages finish in
+        if len(page_indexes) > 0:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                yield from executor.map(lambda index: self.get_page(info, index), page_indexes)
+
+    def get_apidata(self, info: Dict) -> pd.DataFrame:
+        """
+        Every page of one opnSvcId(None when the period has no data)
+        """
+        opnSvcId = info['opnSvcId']
+
         try:
-            total_data_count = response_dict['result']['header']['paging']['totalCount']
-            if total_data_count < 1:
-                raise EmptyDataFromResponse
-        except Exception as e:
+            response_dataframe = collect_pages(self.iter_pages(info))
+        except EmptyDataFromResponse:
             print(f"{opnSvcId}서비스에는 {self.start_date}부터 {self.end_date}까지의 데이터가 없습니다")
             return None
-        
-        iter_count = (total_data_count // page_size)
-        
-
-        # Make fundamental dataFrame
-        response_dataframe = self.make_dataframe(response_dict)
-        
-        # Iteration for full data
-        for _ in range(iter_count):
-            page_index += 1
-            info['pageIndex'] = page_index
 
-            response_dict = self.request_api(params=info)
-            tmp_dataframe = self.make_dataframe(response_dict)
-            
-            # data concat
-            response_dataframe = pd.concat([response_dataframe, tmp_dataframe])
-            time.sleep(1)
-        
-        # Reset index after concatenation
-        response_dataframe.reset_index(drop=True, inplace=True)
         print(f"{opnSvcId}서비스의 {self.start_date}부터 {self.end_date}의 데이터를 성공적으로 다운받았습니다")
         return response_dataframe
     
     def make_dataframe(self, response_dict: Dict) -> pd.DataFrame:
-        df = pd.json_normalize(response_dict['result']['body']['rows'][0]['row'])
-        return df
+        return localdata_dataframe(response_dict)
     
 
 class RequestSeoulBusData(RequestData):
@@ -186,13 +246,14 @@ class RequestSeoulBusData(RequestData):
 
         url = self.seoul_bus_url + f'{key}/{type}/{service}/{start_index}/{end_index}'
 
-        response = requests.get(url, verify=False)
-        response_text = response.text
-        response_dict = json.loads(response_text)
+        response_dict = self.http.get_json(url)
 
         return response_dict
     
-    def get_apidata(self) -> pd.DataFrame:
+    def iter_pages(self) -> Iterator[pd.DataFrame]:
+        """
+        Page frames of every Seoul bus stop, start/end index window moved by page_size
+        """
         # info for request
         start_index = self.info['start_index']
         end_index = self.info['end_index']
@@ -203,13 +264,13 @@ class RequestSeoulBusData(RequestData):
         
         # Count total to get info how many data are to be changed
         total_data_count = response_dict['busStopLocationXyInfo']['list_total_count']
-        iter_count = (total_data_count // page_size)
+        page_count = math.ceil(total_data_count / page_size)
 
         # Make fundamental dataFrame
-        response_dataframe = self.make_dataframe(response_dict)
+        yield self.make_dataframe(response_dict)
         
         # Iteration for full data
-        for _ in range(iter_count):
+        for _ in range(page_count - 1):
             
             # Renew index 
             start_index += page_size
@@ -219,15 +280,16 @@ class RequestSeoulBusData(RequestData):
             self.info['end_index'] = end_index
 
             # Request Seoul Bus API
-            response_dict = self.request_api(params=self.info)
-            tmp_dataframe = self.make_dataframe(response_dict)
-            
-            # Data concat
-            response_dataframe = pd.concat([response_dataframe, tmp_dataframe])
             time.sleep(1)
-        
-        # reset index after concatenation
-        response_dataframe.reset_index(drop=True, inplace=True)
+            response_dict = self.request_api(params=self.info)
+            yield self.make_dataframe(response_dict)
+
+    def get_apidata(self, info: Dict = None) -> pd.DataFrame:
+        if info is not None:
+            self.info = info
+
+        # Data concat, once
+        response_dataframe = collect_pages(self.iter_pages())
 
         # 서울 코드 붙이기
         response_dataframe['CityID'] = 11
@@ -245,8 +307,20 @@ class RequestOtherBusData(RequestData):
     other_bus_url = 'https://apis.data.go.kr/1613000/BusSttnInfoInqireService/getSttnNoList'
     other_possible_list_url = 'http://apis.data.go.kr/1613000/BusSttnInfoInqireService/getCtyCodeList'
 
-    def __init__(self, auth_key) -> None:
+    # API quota: requests per second and burst of the shared token bucket
+    default_rate = 5.0
+    default_burst = 5
+
+    def __init__(self, auth_key, limiter: TokenBucket = None, max_workers: int = 8, checkpoint_path: str = None) -> None:
+        """
+        - limiter: token bucket every request of every city worker waits on
+        - max_workers: cities crawled concurrently
+        - checkpoint_path: directory of finished cities(<cityCode>.parquet), skipped on a rerun
+        """
         self.auth_key = auth_key
+        self.limiter = limiter if limiter is not None else TokenBucket(self.default_rate, self.default_burst)
+        self.max_workers = max_workers
+        self.checkpoint_path = checkpoint_path
         self.info = {
                     'page_size' : 2000,
                     'serviceKey' : self.auth_key,
@@ -259,45 +333,66 @@ class RequestOtherBusData(RequestData):
 
         url = self.other_bus_url
 
-        response = requests.get(url, params=params, verify=False)
-        response_text = response.text
-        response_dict = json.loads(response_text)
+        # wait for the rate limiter instead of sleeping between pages
+        self.limiter.acquire()
+
+        response_dict = self.http.get_json(url, params=params)
 
         return response_dict       
 
-    def get_apidata(self) -> pd.DataFrame:
-        
+    def get_apidata(self, info: Dict = None) -> pd.DataFrame:
+        """
+        Bus stops of every city except Seoul
+        - cities are crawled by max_workers threads, each finished city is checkpointed right away
+        - cities with a checkpoint are not requested again
+        - a city without bus stops is left out, any other error of a city raises IncompleteCrawl
+          after every other city is finished(and checkpointed): the rerun only requests the failed cities
+        - the result keeps the order of search_possible_city
+        """
+        if info is not None:
+            self.info = info
+
         # 가능한 city code 조회
         possible_city_df = self.search_possible_city()
+        cities = [(row['citycode'], row['cityname']) for _, row in possible_city_df.iterrows()]
+
+        city_dataframes = {}
+        remaining = []
+        for code, city in cities:
+            checkpoint = self.load_checkpoint(code)
+            if checkpoint is not None:
+                city_dataframes[code] = checkpoint
+            else:
+                remaining.append((code, city))
+
+        if len(city_dataframes) > 0:
+            print(f"checkpoint {len(city_dataframes)}개 도시는 건너뜁니다")
+
+        # Traverse remaining cities to get bus data
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.get_city_data, code, city): (code, city) for code, city in remaining}
+
+            for future in as_completed(futures):
+                code, city = futures[future]
+                try:
+                    city_dataframes[code] = future.result()
+                except EmptyDataFromResponse:
+                    print(f"{city} 도시는 데이터가 없습니다")
+                    continue
+                except Exception as e:
+                    # retries of the http client are exhausted, malformed response, ...
+                    print(f"{city} 수집 실패: {e!r}")
+                    failed.append(city)
+                    continue
 
-        # Make base dataframe to concat
-        code, city = possible_city_df.loc[0]
-        self.info['cityCode'] = code
-
-        all_dataframe = self.get_city_data(city=city)
-
-        print(f"{city} 완료")
-        
-        # Traverse all city to get bus data
-        for _, row in possible_city_df.loc[1:].iterrows():
-            code, city = row['citycode'], row['cityname']
-            
-            # pageNo 항상 초기화
-            self.info['pageNo'] = 1
-            self.info['cityCode'] = code
-
-            try:
-                tmp_dataframe = self.get_city_data(city=city)
-                all_dataframe = pd.concat([all_dataframe, tmp_dataframe])
+                self.save_checkpoint(code, city_dataframes[code])
                 print(f"{city} 완료")
 
-            except Exception as e:
-                print(e)
-                print(f"{city} 도시는 데이터가 없습니다")
+        if len(failed) > 0:
+            raise IncompleteCrawl(failed)
 
-            time.sleep(1)
-        
-        all_dataframe.reset_index(drop=True, inplace=True)
+        all_dataframe = collect_pages(city_dataframes[code] for code, _ in cities if code in city_dataframes)
 
         return all_dataframe
         
@@ -305,43 +400,74 @@ class RequestOtherBusData(RequestData):
         df = pd.json_normalize(response_dict['response']['body']['items']['item'])
         return df
     
-    def get_city_data(self, city: str) -> pd.DataFrame:
-
-        page_no = self.info['pageNo']
-        page_size = self.info['numOfRows']
-        code = self.info['cityCode']
+    def iter_city_pages(self, code: int) -> Iterator[pd.DataFrame]:
+        """
+        Page frames of one city(pageNo always starts from 1)
+        """
+        # own params per city, self.info is shared by the workers
+        params = dict(self.info, cityCode=code, pageNo=1)
+        page_size = params['numOfRows']
 
         # Request
-        response_dict = self.request_api(params=self.info)
+        response_dict = self.request_api(params=params)
         
         # Count total to get info how many data are to be changed
-        total_data_count = response_dict['response']['body']['totalCount']
-        iter_count = (total_data_count // page_size)
+        body = response_dict['response']['body']
+        total_data_count = body['totalCount']
+        # a city without bus stops answers totalCount 0 and items ""
+        if total_data_count < 1 or not body.get('items'):
+            raise EmptyDataFromResponse
+        page_count = math.ceil(total_data_count / page_size)
 
         # Make fundamental dataFrame
-        response_dataframe = self.make_dataframe(response_dict)
+        yield self.make_dataframe(response_dict)
     
         # Iteration for full data
-        for _ in range(iter_count):
-            page_no += 1
-            self.info['pageNo'] = page_no
+        for page_no in range(2, page_count + 1):
+            response_dict = self.request_api(params=dict(params, pageNo=page_no))
+            yield self.make_dataframe(response_dict)
 
-            response_dict = self.request_api(params=self.info)
-            tmp_dataframe = self.make_dataframe(response_dict)
-            
-            # data concat
-            response_dataframe = pd.concat([response_dataframe, tmp_dataframe])
-            time.sleep(1)
-    
-        # reset index after concatenation
-        response_dataframe.reset_index(drop=True, inplace=True)
+    def get_city_data(self, code: int, city: str) -> pd.DataFrame:
+        # data concat, once
+        response_dataframe = collect_pages(self.iter_city_pages(code))
 
         # Add city id and city name
         response_dataframe['CityID'] = code
         response_dataframe['CityName'] = city
 
         return response_dataframe
-    
+
+    def checkpoint_file(self, code: int) -> str:
+        return os.path.join(self.checkpoint_path, f"{code}.parquet")
+
+    def load_checkpoint(self, code: int) -> pd.DataFrame:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_file(code)):
+            return None
+        return pd.read_parquet(self.checkpoint_file(code))
+
+    def save_checkpoint(self, code: int, city_df: pd.DataFrame) -> None:
+        if self.checkpoint_path is None:
+            return
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+
+        # json values of one column may mix numbers and strings(e.g. nodeno), parquet needs one type
+        object_columns = city_df.select_dtypes(include='object').columns
+        city_df = city_df.astype({column: 'string' for column in object_columns})
+
+        # write then rename: a crash never leaves a half written checkpoint behind
+        path = self.checkpoint_file(code)
+        city_df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def clear_checkpoints(self) -> None:
+        """
+        Remove every checkpoint(the next crawl starts from scratch)
+        """
+        if self.checkpoint_path is None or not os.path.isdir(self.checkpoint_path):
+            return
+        for file_name in os.listdir(self.checkpoint_path):
+            if file_name.endswith('.parquet'):
+                os.remove(os.path.join(self.checkpoint_path, file_name))
 
     def search_possible_city(self) -> pd.DataFrame:
         
@@ -350,9 +476,8 @@ class RequestOtherBusData(RequestData):
                 '_type' : 'json',
                 }
 
-        response = requests.get(url, params=params, verify=False)
-        response_text = response.text
-        response_json = json.loads(response_text)
+        self.limiter.acquire()
+        response_json = self.http.get_json(url, params=params)
         possible_city_df = pd.DataFrame(response_json['response']['body']['items']['item'])
 
         print('검색 가능한 도시 조회 완료\n')
@@ -378,24 +503,18 @@ class RequestMetroData(RequestData):
         Get json data from Metrodata API server
         """
 
-        # Request Localdata API server and get response
-        response = requests.get(RequestMetroData.url, params=params, verify=False)
-        response_text = response.text
-
-        # Need Exception handling when request data from API server(404, 500)
-
-        # text to json
-        response_dict = json.loads(response_text)
+        # Request Metrodata API server(timeouts, 5xx and quota pages are retried by the client)
+        response_dict = self.http.get_json(RequestMetroData.url, params=params)
 
         return response_dict
 
-    def get_apidata(self) -> pd.DataFrame:
+    def iter_pages(self) -> Iterator[pd.DataFrame]:
+        """
+        Station frame of every line of every rail company(lines without data are skipped)
+        """
         # 가능한 지하철 코드 조회
         possible_opr_dict = self.get_metro_cd()
 
-        # 빈 데이터프레임 만들기
-        all_dataframe = pd.DataFrame()
-
         for rail_opr, line_list in possible_opr_dict.items():
             for line in line_list:
                 self.info['railOprIsttCd'] = rail_opr
@@ -405,15 +524,19 @@ class RequestMetroData(RequestData):
                 try:
                     response_dict = self.request_api(params=self.info)
                     response_df = self.make_dataframe(response_dict)
-                    all_dataframe = all_dataframe.append(response_df, ignore_index=True)
 
                 except Exception as e:
                     print(e)
                     print(f"{rail_opr}의 {line}은 데이터가 없습니다")
 
+                else:
+                    yield response_df
+
                 time.sleep(1)
 
-        all_dataframe.reset_index(drop=True, inplace=True)
+    def get_apidata(self) -> pd.DataFrame:
+        # DataFrame.append was removed in pandas 2, the lines are concatenated once
+        all_dataframe = collect_pages(self.iter_pages())
         return all_dataframe
 
     def make_dataframe(self, response_dict: Dict) -> pd.DataFrame:
@@ -1,58 +1,639 @@
-import pandas as pd
+import numpy as np
 from typing import List, Dict, Tuple
 from utils.db_connector import DBManagement
+from utils.spatial_index import SpatialIndex, bounding_box
+from utils.cache import RadiusCache
+from utils.density import DensityTiles, flag_layers, layer_name
+from utils.score_raster import ScoreRaster
+from utils.snapshot import FacilitySnapshot
+from utils.data_version import DataVersionWatcher
+from utils.data_holder import DoubleBuffer
+from utils.single_flight import SingleFlight
+from utils.hashtag import hashtag_engine, feature_flags
+from utils.scoring import ScoreWeights, score_kernel
+from utils.facility import facility_registry, get_facility, validate_facilities, unified_table
+from utils.metrics import metrics
 import os
 import math
+import json
+import base64
+from concurrent.futures import ThreadPoolExecutor
 
 current_file_path = os.path.abspath(__file__)
 root_path = os.path.dirname(os.path.dirname(current_file_path))
+db_info_path = os.path.join(root_path, "secret_key", "db_info.txt")
+
+# every facility kind(table) served by the API, see utils/facility.py
+facility_kinds = list(facility_registry)
+
+# optional in-process engine(DoubleBuffer of a SpatialIndex), loaded by use_spatial_index()/use_snapshot_index()
+spatial_index = None
+
+# optional response cache, enabled by use_radius_cache()
+radius_cache = None
+
+# optional single-table lookup, enabled by use_unified_table()
+unified_lookup = False
+
+# optional precomputed count tiles, loaded by use_density_tiles()
+density_tiles = None
+
+# optional precomputed score raster, loaded by use_score_raster()
+score_raster = None
+
+def fetch_data_version() -> int:
+    with DBManagement.borrow(db_info_path) as dbm:
+        return dbm.get_data_version()
+
+# data version written by the build/update scripts
+data_version = DataVersionWatcher(fetch_data_version)
+
+def fetch_table_sizes(facilities: List[str]) -> Dict[str, int]:
+    with DBManagement.borrow(db_info_path) as dbm:
+        return {facility: dbm.table_size(get_facility(facility).table) for facility in facilities}
+
+# every kind but metro is scored
+score_kinds = [facility for facility in facility_kinds if facility != 'metro']
+
+# scoring weights from the live table sizes, refreshed after every ingest run(data version change)
+score_weights = ScoreWeights(fetch_table_sizes, score_kinds)
+data_version.subscribe(score_weights.refresh)
+
+# identical concurrent radius lookups share one execution
+radius_flight = SingleFlight()
+
+# bounded thread pool for concurrent lookups, each lookup borrows its own pooled connection
+lookup_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('STUDIO_LOOKUP_WORKERS', 8)),
+                                     thread_name_prefix='radius_lookup')
+
+def load_spatial_index(facilities: List[str], cell_size: float) -> SpatialIndex:
+    index = SpatialIndex(cell_size=cell_size)
+    with DBManagement.borrow(db_info_path) as dbm:
+        for facility in validate_facilities(facilities):
+            spec = get_facility(facility)
+            dbm.cursor.execute(f"SELECT {spec.name_column}, {spec.address_expression()}, lat, lon FROM {spec.table}")
+            index.add(facility, dbm.cursor.fetchall())
+
+    return index
+
+def load_snapshot_index(root: str, version: int = None) -> SpatialIndex:
+    snapshot = FacilitySnapshot.open_current(root)
+
+    # the scripts write the snapshot right after bumping the version, retried until it is there
+    if version is not None and snapshot.version < version:
+        raise RuntimeError(f'snapshot {snapshot.version} is older than data version {version}')
+
+    return SpatialIndex.from_snapshot(snapshot)
+
+def use_spatial_index(facilities: List[str] = facility_kinds, cell_size: float = SpatialIndex.default_cell_size) -> SpatialIndex:
+    """
+    Load the facility tables into an in-process SpatialIndex
+    - request_to_rds answers from it instead of the radius SQL
+    - rebuilt in the background and swapped when the data version changes
+    """
+    global spatial_index
+
+    spatial_index = DoubleBuffer(lambda version: load_spatial_index(facilities, cell_size), name='spatial_index')
+    data_version.subscribe(spatial_index.refresh)
+    # the version read before the scan: the loaded copy is at least that new
+    index = spatial_index.load(data_version.check())
+
+    print(f'spatial index 로드 완료: {index.size()}')
+    return index
+
+def use_snapshot_index(root: str) -> SpatialIndex:
+    """
+    use_spatial_index from the memory-mapped snapshot written by the build/update scripts
+    - startup is an mmap instead of a table scan, and every worker shares the same pages
+    - a snapshot older than the data version is served until the background refresh catches up
+    """
+    global spatial_index
+
+    spatial_index = DoubleBuffer(lambda version: load_snapshot_index(root, version), name='spatial_index')
+    data_version.subscribe(spatial_index.refresh)
+    # tagged with the version of the snapshot actually mapped
+    index = spatial_index.load(FacilitySnapshot.open_current(root).version)
+    print(f'spatial index 로드 완료(snapshot): {index.size()}')
+
+    # the watcher's first read notifies nobody: a stale snapshot would be kept until the next bump
+    version = data_version.check(force=True)
+    if version is not None and spatial_index.version < version:
+        print(f'snapshot {spatial_index.version}이 data version {version}보다 오래되어 다시 로드합니다')
+        spatial_index.refresh(version)
+
+    return index
+
+def current_spatial_index(facilities_type: List[str]) -> SpatialIndex:
+    """
+    The current SpatialIndex when it has every requested kind, None otherwise
+    - read once per request, a swap during the request does not affect it
+    """
+    index = spatial_index.get() if spatial_index is not None else None
+    if index is not None and index.covers(facilities_type):
+        return index
+    return None
+
+def served_data_version() -> int:
+    """
+    Data version of the data lookups are answered from(ETag of the responses)
+    - the polled data version for SQL lookups
+    - the version of the loaded copy while an in-process index is active, None during its rebuild
+      (responses of the old copy must not be tagged with the new version)
+    """
+    version = data_version.check()
+    if spatial_index is None:
+        return version
+    if spatial_index.building:
+        return None
+    return spatial_index.version
+
+def spatial_index_status() -> Dict:
+    if spatial_index is None:
+        return {}
+
+    status = spatial_index.status()
+    index = spatial_index.get()
+    status['size'] = index.size() if index is not None else {}
+    return status
+
+def use_radius_cache(max_size: int = 4096, ttl: float = 300.0, cell_size: float = 0.0005) -> RadiusCache:
+    """
+    Put a geo-quantized LRU + TTL cache in front of request_to_rds
+    - cleared whenever the data version changes
+    """
+    global radius_cache
+
+    radius_cache = RadiusCache(max_size=max_size, ttl=ttl, cell_size=cell_size)
+    data_version.subscribe(radius_cache.invalidate)
+    # entries filled from the old index while it was being rebuilt
+    if spatial_index is not None:
+        spatial_index.subscribe(radius_cache.invalidate)
+    return radius_cache
+
+def use_unified_table() -> None:
+    """
+    Answer the radius SQL from the unified facility table
+    - one spatial index probe with kind IN (...) instead of a UNION ALL over every kind table
+    - the table is filled by the build/update scripts(sync_unified_table in utils/facility.py)
+    """
+    global unified_lookup
+    unified_lookup = True
+
+def use_density_tiles(path: str) -> DensityTiles:
+    """
+    Load the density tiles written by scripts/build_density_tiles.py(memory-mapped)
+    - request_counts answers from them instead of the summary SQL
+    """
+    global density_tiles
+
+    density_tiles = DensityTiles(path)
+    print(f'density tiles 로드 완료: {list(density_tiles.layers)} (error margin {density_tiles.error_margin():.1f}m)')
+    return density_tiles
+
+def use_score_raster(path: str) -> ScoreRaster:
+    """
+    Load the score rasters written by scripts/build_score_raster.py(memory-mapped)
+    """
+    global score_raster
+
+    score_raster = ScoreRaster(path)
+    print(f'score raster 로드 완료: {score_raster.radii()}m')
+    return score_raster
+
+def invalidate_radius_cache(dbm: DBManagement) -> None:
+    """
+    Hook for the update scripts after they commit a refresh
+    - bumps the data version row so that every serving process drops its cache
+    """
+    dbm.bump_data_version()
+
+    if radius_cache is not None:
+        radius_cache.invalidate()
 
 # rds에서 주소에 대한 정보 가져오기
 def request_to_rds(facilities_type: List[str], lat: float, lon: float, radius_meter: int) -> List:
 
-    # Connect to RDS
-    path = os.path.join(root_path, "secret_key", "db_info.txt")
-    db_info_dict = DBManagement.get_db_info(path)
-    dbm = DBManagement(**db_info_dict)
-    print(f'성공적으로 MySQL {db_info_dict["database"]} 데이터베이스에 연결 완료')
+    validate_facilities(facilities_type)
+    data_version.check()
+
+    if radius_cache is None:
+        # normalized request: lat/lon at the precision of the stored coordinates(7 decimals)
+        key = (tuple(facilities_type), round(float(lat), 7), round(float(lon), 7), int(radius_meter))
+        return radius_flight.do(key, search_radius, facilities_type, lat, lon, radius_meter)
+
+    key = radius_cache.make_key(facilities_type, lat, lon, radius_meter)
+    response_list = radius_cache.get(key)
+
+    if response_list is None:
+        response_list = radius_flight.do(key, search_cell, key, facilities_type, radius_meter)
+
+    return response_list
+
+def search_cell(key: Tuple, facilities_type: List[str], radius_meter: int) -> List:
+    """
+    Answer for the cell center so that every request in the cell gets the same response
+    """
+    cell_lat, cell_lon = radius_cache.cell_center(key)
+    response_list = search_radius(facilities_type, cell_lat, cell_lon, radius_meter)
+    radius_cache.put(key, response_list)
+
+    return response_list
+
+def request_to_rds_many(facilities_type: List[str], locations: List[Tuple[float, float]], radius_meter: int,
+                        summary: bool = False, limit: int = None, cursors: List[str] = None) -> List[List]:
+    """
+    request_to_rds for several locations at once
+    - lookups run concurrently, so the latency is about one query instead of the sum
+    - with summary/limit/cursors every location goes through request_to_rds_page
+    """
+    if not summary and limit is None and not cursors:
+        futures = [lookup_executor.submit(request_to_rds, facilities_type, lat, lon, radius_meter) for lat, lon in locations]
+    else:
+        cursors = cursors or [None] * len(locations)
+        futures = [lookup_executor.submit(request_to_rds_page, facilities_type, lat, lon, radius_meter, summary, limit, cursor)
+                   for (lat, lon), cursor in zip(locations, cursors)]
+
+    return [future.result() for future in futures]
+
+def encode_cursor(offsets: Dict[str, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(offsets).encode()).decode()
+
+def decode_cursor(cursor: str) -> Dict[str, int]:
+    """
+    {facility: offset of the next page}, raises ValueError for a broken cursor
+    - offsets are non-negative ints(they are bound to OFFSET and slice the index results)
+    """
+    try:
+        offsets = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # bool is an int subclass, JSON true is not an offset
+        valid = all(type(offset) is int and offset >= 0 for offset in offsets.values())
+    except Exception:
+        valid = False
+
+    if not valid:
+        raise ValueError(f'invalid cursor: {cursor}')
+    return {str(facility): offset for facility, offset in offsets.items()}
+
+def request_to_rds_page(facilities_type: List[str], lat: float, lon: float, radius_meter: int,
+                        summary: bool = False, limit: int = None, cursor: str = None) -> List:
+    """
+    Radius response with the limits pushed down into the SQL
+    - summary: counts and hashtags only(no place lists)
+    - limit: top-k nearest places per facility kind
+    - cursor: next page of the place lists(next_cursor of the previous response)
+    - returns [total_count, facility_body, hashtag_list, next_cursor]
+    - count is always the number of places in the radius, not the page size
+    - raises ValueError for a broken cursor or a cursor without limit
+    """
+    validate_facilities(facilities_type)
+    offsets, page_types = page_offsets(facilities_type, limit, cursor)
+    data_version.check()
+
+    index = current_spatial_index(facilities_type)
+    if index is not None:
+        with metrics.stage('spatial_index'):
+            total_count, facility_body = index.query(facilities_type, lat, lon, radius_meter)
+        hashtag_list = find_hashtag(facility_body)
+
+        for facility, body in facility_body.items():
+            start = offsets.get(facility, body['count'])
+            end = body['count'] if limit is None else start + limit
+            body['place'] = body['place'][start:end]
+
+    else:
+        (count_query, count_params), page_query = build_page_queries(facilities_type, lat, lon, radius_meter,
+                                                                     summary, limit, offsets, page_types)
+
+        with DBManagement.borrow(db_info_path) as dbm:
+            count_result = dbm.execute_prepared(count_query, count_params)
+
+            page_result = []
+            if page_query is not None:
+                page_result = dbm.execute_prepared(*page_query)
+
+        total_count, facility_body, hashtag_list = make_page_body(facilities_type, count_result, page_result)
+
+    return finish_page(total_count, facility_body, hashtag_list, summary, limit, offsets, page_types)
+
+def page_offsets(facilities_type: List[str], limit: int = None, cursor: str = None) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Page offset per kind and the kinds which still have places to page
+    - kinds missing from the cursor are already exhausted
+    - raises ValueError for a broken cursor or a cursor without limit
+    """
+    if cursor and limit is None:
+        # the page size is not part of the cursor
+        raise ValueError('cursor requires limit')
+
+    offsets = decode_cursor(cursor) if cursor else {facility: 0 for facility in facilities_type}
+    page_types = [facility for facility in facilities_type if facility in offsets]
+
+    return offsets, page_types
+
+def build_page_queries(facilities_type: List[str], lat: float, lon: float, radius_meter: int, summary: bool,
+                       limit: int, offsets: Dict[str, int], page_types: List[str]) -> Tuple[Tuple[str, List], Tuple[str, List]]:
+    """
+    Aggregate(count, flag sums) query of every kind and the page query(None for summary or no page left)
+    """
+    count_query = union_all([build_count_query(facility, lat, lon, radius_meter) for facility in facilities_type])
+
+    page_query = None
+    if not summary and page_types:
+        page_query = union_all([build_radius_query(facility, lat, lon, radius_meter, limit=limit, offset=offsets[facility])
+                                for facility in page_types], order_by="distance")
+
+    return count_query, page_query
+
+def make_page_body(facilities_type: List[str], count_result: List[Tuple], page_result: List[Tuple]) -> Tuple[int, Dict, List[str]]:
+    """
+    total_count, facility_body and hashtags from the rows of build_page_queries
+    """
+    _, facility_body, _ = make_facility_body(facilities_type, page_result)
+
+    # counts and flag sums come from the aggregate query
+    flag_counts = {}
+    for row in count_result:
+        kind = row[0]
+        facility_body[kind]['count'] = int(row[1])
+        flag_counts[kind] = {flag: int(value) for flag, value in zip(feature_flags, row[2:])}
+
+    total_count = sum(body['count'] for body in facility_body.values())
+    hashtag_list = find_hashtag(facility_body, flag_counts)
+
+    return total_count, facility_body, hashtag_list
 
-    # Make POINT type location based on EPSG4326 
-    location = f'ST_GeomFromText("POINT({lat} {lon})", 4326)'
+def finish_page(total_count: int, facility_body: Dict, hashtag_list: List[str], summary: bool, limit: int,
+                offsets: Dict[str, int], page_types: List[str]) -> List:
+    """
+    [total_count, facility_body, hashtag_list, next_cursor] of request_to_rds_page
+    """
+    metrics.rows(facility_body)
+
+    # next offset of the kinds which still have places left
+    next_offsets = {}
+    if not summary and limit is not None:
+        for facility in page_types:
+            next_offset = offsets[facility] + limit
+            if next_offset < facility_body[facility]['count']:
+                next_offsets[facility] = next_offset
+    next_cursor = encode_cursor(next_offsets) if next_offsets else None
+
+    if summary:
+        facility_body = {facility: {'count': body['count']} for facility, body in facility_body.items()}
+
+    return [total_count, facility_body, hashtag_list, next_cursor]
+
+def request_counts(facilities_type: List[str], lat: float, lon: float, radius_meter: int) -> List:
+    """
+    Counts-only radius response
+    - returns [total_count, facility_body({facility: {'count': n}}), hashtag_list, error_margin]
+    - approximate counts from the density tiles when every kind has a layer and the circle is inside the tiles,
+      error_margin = meters around the radius in which places may be miscounted(see utils/density.py)
+    - exact counts from the summary SQL otherwise(error_margin 0)
+    """
+    validate_facilities(facilities_type)
+
+    if (density_tiles is None or not all(density_tiles.has_layer(facility) for facility in facilities_type)
+            or not density_tiles.covers(lat, lon, radius_meter)):
+        total_count, facility_body, hashtag_list, _ = request_to_rds_page(facilities_type, lat, lon, radius_meter, summary=True)
+        return [total_count, facility_body, hashtag_list, 0.0]
+
+    layers = list(facilities_type)
+    flag_pairs = [(facility, flag) for facility, flag in flag_layers()
+                  if facility in facilities_type and density_tiles.has_layer(layer_name(facility, flag))]
+    layers += [layer_name(facility, flag) for facility, flag in flag_pairs]
+    counts = density_tiles.counts(layers, lat, lon, radius_meter)
+
+    facility_body = {facility: {'count': counts[facility]} for facility in facilities_type}
+    flag_counts = {facility: {flag: 0 for flag in feature_flags} for facility in facilities_type}
+    for facility, flag in flag_pairs:
+        flag_counts[facility][flag] = counts[layer_name(facility, flag)]
+
+    total_count = sum(body['count'] for body in facility_body.values())
+    hashtag_list = find_hashtag(facility_body, flag_counts)
+
+    return [total_count, facility_body, hashtag_list, density_tiles.error_margin()]
+
+def search_radius(facilities_type: List[str], lat: float, lon: float, radius_meter: int) -> List:
+
+    # in-process lookup when every requested kind is loaded
+    index = current_spatial_index(facilities_type)
+    if index is not None:
+        with metrics.stage('spatial_index'):
+            total_count, facility_body = index.query(facilities_type, lat, lon, radius_meter)
+        hashtag_list = find_hashtag(facility_body)
+        metrics.rows(facility_body)
+        return [total_count, facility_body, hashtag_list]
 
     # Query 저장
-    radius_query_list = []
-
-    for facility in facilities_type:
-        ## bus같은경우는 주소가 저장 안되어있으니 일단 NULL로 다 채우기
-        if facility == 'bus':
-            radius_query = f"""
-            SELECT StationName AS Name, '{facility}' AS Kind, ST_Distance_Sphere({location}, coordinates) AS distance, NULL AS address, lat, lon
-            FROM {facility}
-            WHERE ST_Contains(ST_Buffer({location}, {radius_meter}), coordinates) AND ST_Distance_Sphere({location}, coordinates) < {radius_meter}
+    if unified_lookup:
+        radius_query_list = [build_unified_query(facilities_type, lat, lon, radius_meter)]
+    else:
+        radius_query_list = [build_radius_query(facility, lat, lon, radius_meter) for facility in facilities_type]
+    radius_query, radius_params = union_all(radius_query_list, order_by="distance")
+
+    # execute on a connection borrowed from the process-wide pool
+    with DBManagement.borrow(db_info_path) as dbm:
+        query_result = dbm.execute_prepared(radius_query, radius_params)
+
+    total_count, facility_body, flag_counts = make_facility_body(facilities_type, query_result)
+    hashtag_list = find_hashtag(facility_body, flag_counts)
+    metrics.rows(facility_body)
+    response_list = [total_count, facility_body, hashtag_list]
+
+    return response_list
+
+def search_radius_batch(facilities_type: List[str], locations: List[Tuple[float, float]], radius_meter: int) -> List[List]:
+    """
+    search_radius for many locations with one round trip
+    - every subquery is tagged with the location index(loc)
+    """
+    validate_facilities(facilities_type)
+    data_version.check()
+
+    if current_spatial_index(facilities_type) is not None:
+        return [search_radius(facilities_type, lat, lon, radius_meter) for lat, lon in locations]
+
+    if unified_lookup:
+        radius_query_list = [build_unified_query(facilities_type, lat, lon, radius_meter, loc=loc)
+                             for loc, (lat, lon) in enumerate(locations)]
+    else:
+        radius_query_list = [build_radius_query(facility, lat, lon, radius_meter, loc=loc)
+                             for loc, (lat, lon) in enumerate(locations)
+                             for facility in facilities_type]
+    radius_query, radius_params = union_all(radius_query_list, order_by="loc, distance")
+
+    with DBManagement.borrow(db_info_path) as dbm:
+        query_result = dbm.execute_prepared(radius_query, radius_params)
+
+    # split rows by location(the last column)
+    rows_by_location = [[] for _ in locations]
+    for row in query_result:
+        rows_by_location[row[-1]].append(row)
+
+    response_lists = []
+    for rows in rows_by_location:
+        total_count, facility_body, flag_counts = make_facility_body(facilities_type, rows)
+        metrics.rows(facility_body)
+        response_lists.append([total_count, facility_body, find_hashtag(facility_body, flag_counts)])
+
+    return response_lists
+
+def count_radius_batch(facilities_type: List[str], locations: List[Tuple[float, float]], radius_meter: int) -> List[List]:
+    """
+    Counts-only search_radius_batch(no place rows are fetched)
+    - one aggregate(COUNT, feature flag SUM) subquery per location and kind, tagged with loc
+    - hashtags of every location from one vectorized find_mask over the count arrays
+    - returns [total_count, facility_body({facility: {'count': n}}), hashtag_list] per location
+    """
+    validate_facilities(facilities_type)
+    data_version.check()
+
+    if current_spatial_index(facilities_type) is not None:
+        response_lists = search_radius_batch(facilities_type, locations, radius_meter)
+        return [[total_count, {facility: {'count': body['count']} for facility, body in facility_body.items()}, hashtag_list]
+                for total_count, facility_body, hashtag_list in response_lists]
+
+    count_query, count_params = union_all([build_count_query(facility, lat, lon, radius_meter, loc=loc)
+                                           for loc, (lat, lon) in enumerate(locations)
+                                           for facility in facilities_type])
+
+    with DBManagement.borrow(db_info_path) as dbm:
+        query_result = dbm.execute_prepared(count_query, count_params)
+
+    # (kind, location) arrays, rows are Kind, count, flag sums..., loc
+    counts = {facility: np.zeros(len(locations), dtype='int64') for facility in facilities_type}
+    flag_counts = {facility: {flag: np.zeros(len(locations), dtype='int64') for flag in feature_flags} for facility in facilities_type}
+    for row in query_result:
+        kind, loc = row[0], row[-1]
+        counts[kind][loc] = int(row[1])
+        for flag, value in zip(feature_flags, row[2:-1]):
+            flag_counts[kind][flag][loc] = int(value)
+
+    with metrics.stage('hashtag'):
+        masks = hashtag_engine.find_mask(counts, flag_counts)
+
+    response_lists = []
+    for loc in range(len(locations)):
+        facility_body = {facility: {'count': int(counts[facility][loc])} for facility in facilities_type}
+        metrics.rows(facility_body)
+        response_lists.append([sum(body['count'] for body in facility_body.values()), facility_body,
+                               hashtag_engine.decode(masks[loc])])
+
+    return response_lists
+
+def radius_envelope(lat: float, lon: float, radius_meter: int) -> str:
+    """
+    WKT of the lat/lon rectangle around the radius, computed in Python
+    - MBRContains on it is answered by the SPATIAL INDEX(R-tree) of coordinates
+    """
+    lat_min, lon_min, lat_max, lon_max = bounding_box(lat, lon, radius_meter)
+
+    return f"POLYGON(({lat_min} {lon_min}, {lat_max} {lon_min}, {lat_max} {lon_max}, {lat_min} {lon_max}, {lat_min} {lon_min}))"
+
+def radius_params(lat: float, lon: float, radius_meter: int) -> List:
+    """
+    Bound values of the radius filter: location, envelope, radius
+    """
+    # POINT based on EPSG4326(lat lon)
+    return [f"POINT({lat} {lon})", radius_envelope(lat, lon, radius_meter), radius_meter]
+
+def union_all(queries: List[Tuple[str, List]], order_by: str = None) -> Tuple[str, List]:
+    """
+    One statement(and its params) from several subqueries
+    """
+    query = " UNION ALL".join([subquery for subquery, _ in queries])
+    if order_by is not None:
+        query += f"ORDER BY {order_by}"
+    params = [param for _, subquery_params in queries for param in subquery_params]
+
+    return query, params
+
+def build_radius_query(facility: str, lat: float, lon: float, radius_meter: int, loc: int = None,
+                       limit: int = None, offset: int = 0) -> Tuple[str, List]:
+    """
+    Radius subquery of one facility table with %s placeholders, and its params
+    - the statement text depends only on facility, loc and limit given or not(prepared once per connection)
+    - columns: Name, Kind, distance, address, lat, lon, feature flags(, loc)
+    - loc is an integer literal, not a bound param, so it comes back as an int whatever the driver's param typing
+      (a batch numbers its locations 0..n-1: the statement of n locations is still always the same)
+    - candidates come from the envelope(R-tree), the exact distance is computed once per candidate
+      and filtered with HAVING on its alias
+    - limit: only the nearest places(ORDER BY distance LIMIT inside the subquery)
+    """
+    spec = get_facility(facility)
+    flag_column = ", ".join(spec.flag_columns())
+    loc_column = f", {int(loc)} AS loc" if loc is not None else ""
+
+    location, envelope, radius = radius_params(lat, lon, radius_meter)
+    params = [location, envelope, radius]
+
+    radius_query = f"""
+            SELECT {spec.name_column} AS Name, '{spec.kind}' AS Kind, ST_Distance_Sphere(ST_GeomFromText(%s, 4326), coordinates) AS distance, {spec.address_expression()} AS address, lat, lon, {flag_column}{loc_column}
+            FROM {spec.table}
+            WHERE MBRContains(ST_GeomFromText(%s, 4326), coordinates)
+            HAVING distance < %s
             """
-        elif facility == 'metro':
-            radius_query = f"""
-            SELECT StationName AS Name, '{facility}' AS Kind, ST_Distance_Sphere({location}, coordinates) AS distance, roadAddress AS address, lat, lon
-            FROM {facility}
-            WHERE ST_Contains(ST_Buffer({location}, {radius_meter}), coordinates) AND ST_Distance_Sphere({location}, coordinates) < {radius_meter}
+
+    if limit is not None:
+        radius_query = f"({radius_query}ORDER BY distance LIMIT %s OFFSET %s)\n"
+        params += [int(limit), int(offset)]
+    return radius_query, params
+
+def build_unified_query(facilities_type: List[str], lat: float, lon: float, radius_meter: int,
+                        loc: int = None) -> Tuple[str, List]:
+    """
+    Radius query of every requested kind from the unified facility table, and its params
+    - same columns as build_radius_query
+    """
+    validate_facilities(facilities_type)
+    kind_placeholder = ", ".join(["%s"] * len(facilities_type))
+    flag_column = ", ".join(feature_flags)
+    loc_column = f", {int(loc)} AS loc" if loc is not None else ""
+
+    location, envelope, radius = radius_params(lat, lon, radius_meter)
+    params = [location, envelope] + list(facilities_type) + [radius]
+
+    unified_query = f"""
+            SELECT name AS Name, kind AS Kind, ST_Distance_Sphere(ST_GeomFromText(%s, 4326), coordinates) AS distance, address, lat, lon, {flag_column}{loc_column}
+            FROM {unified_table}
+            WHERE MBRContains(ST_GeomFromText(%s, 4326), coordinates) AND kind IN ({kind_placeholder})
+            HAVING distance < %s
             """
-        else:
-            radius_query = f"""
-            SELECT bplcNm AS Name, '{facility}' AS Kind, ST_Distance_Sphere({location}, coordinates) AS distance, rdnWhlAddr AS address, lat, lon
-            FROM {facility}
-            WHERE ST_Contains(ST_Buffer({location}, {radius_meter}), coordinates) AND ST_Distance_Sphere({location}, coordinates) < {radius_meter}
+    return unified_query, params
+
+def build_count_query(facility: str, lat: float, lon: float, radius_meter: int, loc: int = None) -> Tuple[str, List]:
+    """
+    Count and feature flag sums of one facility table in the radius, and its params
+    - columns: Kind, count, feature flag sums(, loc as an integer literal like build_radius_query)
+    """
+    spec = get_facility(facility)
+    flag_column = ", ".join(spec.flag_columns())
+    flag_sum = ", ".join([f"IFNULL(SUM({flag}), 0) AS {flag}" for flag in feature_flags])
+    loc_column = f", {int(loc)} AS loc" if loc is not None else ""
+
+    count_query = f"""
+            SELECT '{spec.kind}' AS Kind, COUNT(*) AS count, {flag_sum}{loc_column}
+            FROM (
+                SELECT {flag_column}, ST_Distance_Sphere(ST_GeomFromText(%s, 4326), coordinates) AS distance
+                FROM {spec.table}
+                WHERE MBRContains(ST_GeomFromText(%s, 4326), coordinates)
+                HAVING distance < %s
+            ) AS candidate
             """
-        
-        radius_query_list.append(radius_query)
+    return count_query, radius_params(lat, lon, radius_meter)
 
-    radius_query = " UNION ALL".join(radius_query_list) + "ORDER BY distance;"
+def make_facility_body(facilities_type: List[str], query_result: List[Tuple]) -> Tuple[int, Dict, Dict]:
+    """
+    facility_body and the per-kind sum of every feature flag column
+    """
+    with metrics.stage('facility_body'):
+        return _make_facility_body(facilities_type, query_result)
 
-    # execute
-    dbm.cursor.execute(radius_query)
-    query_result = dbm.cursor.fetchall()
+def _make_facility_body(facilities_type: List[str], query_result: List[Tuple]) -> Tuple[int, Dict, Dict]:
     total_count = len(query_result)
-
     facility_body = {facility : {"count": 0, "place": []} for facility in facilities_type}
+    flag_counts = {facility: {flag: 0 for flag in feature_flags} for facility in facilities_type}
     
     for row in query_result:
         kind = row[1]
@@ -65,98 +646,41 @@ def request_to_rds(facilities_type: List[str], lat: float, lon: float, radius_me
                                             })
         facility_body[kind]['count'] += 1
 
-    hashtag_list = find_hashtag(facility_body)
-    response_list = [total_count, facility_body, hashtag_list]
-
-    return response_list
-
-def initialize_dataframe(data_dict: dict, key: str) -> pd.DataFrame:
-    try:
-        dataframe = pd.DataFrame(data_dict[key]['place'])
-    except:
-        dataframe = pd.DataFrame()
-    
-    return dataframe
-
-def find_hashtag(location_dict: dict ) -> List[str]:
-
-    hashtag_list = []
-
-    # 데이터 초기화
-    dataframes = {}
-    categories = ['hospital', 'pharmacy', 'laundry', 'hair', 'gym', 'mart', 'convenience', 'cafe', 'bus', 'metro']
-
-    for category in categories:
-        dataframes[category] = initialize_dataframe(location_dict, category)
-
-    
-    # 헬스장
-    if not dataframes['gym'].empty and dataframes['gym']['name'].str.contains('헬스|짐|gym|피트니스|휘트니스|fitness|PT|피티', regex=True).any():
-        hashtag_list.append("#헬스장")
-        
-    # 코인빨래방
-    if not dataframes['laundry'].empty and dataframes['laundry']['name'].str.contains('코인|크린토피아|셀프|24', regex=True).any():
-        hashtag_list.append("#코인빨래방")
-    
-    #대형쇼핑몰
-    if len(dataframes['mart']) >= 1:
-        hashtag_list.append("#마트/쇼핑몰")
-    
-    #편세권
-    if len(dataframes['convenience']) >= 3:
-        hashtag_list.append("#편세권")
-    
-    # 스세권
-    if not dataframes['cafe'].empty and dataframes['cafe']['name'].str.contains('스타벅스', regex=True).any():
-        hashtag_list.append("#스세권")
-        
-    # 역세권
-    if len(dataframes['metro']) >= 3:
-        hashtag_list.append("#초역세권")
-    elif len(dataframes['metro']) >= 1:
-        hashtag_list.append('#역세권')
-        
-        
-    return hashtag_list
-
-def calculate_score(facilities_type: List[str], total_count: int, facility_body: pd.DataFrame) ->Tuple[Dict, float]:
-
-    # 가중치로 활용하기 위한 각 업종별 전체 데이터 개수(나중에 자동화 하기)
-    weight = {
-            'bus': 200000,
-            'cafe': 51000,
-            'convenience': 52000,
-            'gym': 35000,
-            'hair': 180000,
-            'hospital': 70000,
-            'mart':2700,
-            'laundry': 20000,
-            'pharmacy': 24000
-            }
-    
-    # 지하철은 제외
-    if 'metro' in facilities_type:
-        facilities_type.remove('metro')
-
-
-    weight_series = pd.Series(weight)
-
-    cnt_series = pd.Series( {type: facility_body[type]['count'] for type in facilities_type} )
-
-    
-    # 전체 중 비율 고려한 수치
-    rate_series = cnt_series / total_count * 100
+        for flag, value in zip(feature_flags, row[6:]):
+            flag_counts[kind][flag] += int(value)
 
+    return total_count, facility_body, flag_counts
 
-    # 가중치 고려한 보정 개수 수치
-    weighted_cnt_series = cnt_series / weight_series[facilities_type] * 70000
+def find_hashtag(location_dict: dict, flag_counts: Dict = None) -> List[str]:
+    """
+    Hashtags of one location from the declarative rules in utils/hashtag.py
+    - flag_counts: precomputed feature flag sums, names are matched when omitted
+    """
+    with metrics.stage('hashtag'):
+        return hashtag_engine.find(location_dict, flag_counts)
 
-    # 개별 score - 소수 첫째자리까지 반올림
-    individual_score = dict(round(rate_series + weighted_cnt_series, 1))
-    # 총 점수 = 평균 - 소수 첫째자리까지 반올림
-    total_score = round(sum(individual_score.values()) / len(facilities_type), 1)
+def calculate_score(facilities_type: List[str], total_count: int, facility_body: Dict, weight: Dict = None) ->Tuple[Dict, float]:
+    """
+    Score of one location(metro is not scored)
+    - weight: per-kind weights, score_weights(sync DB lookup) when omitted
+    """
+    individual_scores, total_scores = calculate_score_batch(facilities_type, [total_count], [facility_body], weight)
 
+    return individual_scores[0], total_scores[0]
 
+def calculate_score_batch(facilities_type: List[str], total_counts: List[int], facility_bodies: List[Dict],
+                          weight: Dict = None) -> Tuple[List[Dict], List[float]]:
+    """
+    calculate_score for many locations at once with one NumPy kernel
+    """
+    # 지하철은 제외(caller의 list는 그대로 둔다)
+    score_types = [facility for facility in facilities_type if facility != 'metro']
+    if weight is None:
+        weight = score_weights.get()
 
-    return individual_score, total_score
+    cnt = np.array([[body[facility]['count'] for facility in score_types] for body in facility_bodies], dtype='float64').reshape(len(facility_bodies), len(score_types))
+    with metrics.stage('score'):
+        individual, total_score = score_kernel(cnt, total_counts, [weight[facility] for facility in score_types])
 
+    individual_scores = [dict(zip(score_types, row.tolist())) for row in individual]
+    return individual_scores, total_score.tolist()
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# seconds
+time_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# rows per facility kind in one response
+row_buckets = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Prometheus style histogram(cumulative buckets, sum, count) per label set
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series: Dict[Labels, List] = {}
+
+    def observe(self, value: float, labels: Labels) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (bucket_counts, total, count) in sorted(self.series.items()):
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f"{self.name}_bucket{format_labels(labels + (('le', repr(float(bound))),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.series: Dict[Labels, float] = {}
+
+    def inc(self, value: float, labels: Labels) -> None:
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{format_labels(labels)} {value}" for labels, value in sorted(self.series.items())]
+        return lines
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = [(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels]
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class _StageTimer:
+
+    def __init__(self, metrics: 'Metrics', stage: str) -> None:
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self) -> '_StageTimer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.start)
+
+
+# shared no-op context of a disabled Metrics
+_disabled_timer = nullcontext()
+
+
+class Metrics:
+    """
+    Per-request latency breakdown of the serving path, rendered as Prometheus text on /metrics
+    - stage(name): timer of one stage(connect, sql, fetchall, facility_body, hashtag, score, serialize, ...)
+    - rows(facility_body): rows returned per facility kind
+    - slow_query(query, params, seconds): SQL slower than slow_query_seconds is printed with its params
+    - disabled(default): every call returns right away(one attribute check)
+    """
+
+    def __init__(self, enabled: bool = False, slow_query_seconds: float = 0.5) -> None:
+        self.enabled = enabled
+        self.slow_query_seconds = slow_query_seconds
+        self._lock = threading.Lock()
+
+        self.stage_seconds = Histogram('studio_stage_seconds', 'Time spent in each stage of a request', time_buckets)
+        self.request_seconds = Histogram('studio_request_seconds', 'Request latency per endpoint', time_buckets)
+        self.rows_per_kind = Histogram('studio_rows', 'Rows returned per facility kind in one response', row_buckets)
+        self.slow_queries = Counter('studio_slow_queries_total', 'SQL statements slower than the slow query threshold')
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _disabled_timer
+        return _StageTimer(self, name)
+
+    def observe_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds.observe(seconds, (('stage', name),))
+
+    def observe_request(self, endpoint: str, status: int, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.request_seconds.observe(seconds, (('endpoint', endpoint), ('status', str(status))))
+
+    def rows(self, facility_body: Dict) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            for kind, body in facility_body.items():
+                self.rows_per_kind.observe(body['count'], (('kind', kind),))
+
+    def slow_query(self, query: str, params: Optional[Sequence], seconds: float) -> None:
+        if not self.enabled or seconds < self.slow_query_seconds:
+            return
+        with self._lock:
+            self.slow_queries.inc(1, ())
+        print(f"slow query {seconds * 1000:.1f}ms params={list(params) if params is not None else None}\n{query}")
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (self.request_seconds, self.stage_seconds, self.rows_per_kind, self.slow_queries):
+                lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+# process-wide metrics, STUDIO_METRICS=1 enables them(STUDIO_SLOW_QUERY_MS: slow query threshold, default 500)
+metrics = Metrics(enabled=os.environ.get('STUDIO_METRICS') == '1',
+                  slow_query_seconds=float(os.environ.get('STUDIO_SLOW_QUERY_MS', 500)) / 1000)
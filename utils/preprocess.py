@@ -6,6 +6,8 @@ import re
 from typing import List, Dict
 from abc import *
 
+from utils.hashtag import feature_flags
+
 class ManageLonLat():
 
     # return dataframe except rows which have invalid range lon and lat
@@ -92,9 +94,10 @@ class LocalDataPreprocess(DataPreprocess):
             2. Replace_string
             3. bulk => closed shop remove / not => type change
             4. Filter Cafe, Convenience store
-            5. Replace NaN
-            6. change epgs:5174 to ordinary coordinates(epsg:4326)
-            7. remove data which have invalid lat, lon
+            5. Add feature flags(is_fitness, is_coin_laundry, is_starbucks)
+            6. Replace NaN
+            7. change epgs:5174 to ordinary coordinates(epsg:4326)
+            8. remove data which have invalid lat, lon
             """
             
             # 1. Column realign 
@@ -119,10 +122,14 @@ class LocalDataPreprocess(DataPreprocess):
                 df = LocalDataPreprocess.filter_convenience_store(df)
 
             
-            # 5. Replace NaN
+            # 5. Add feature flags
+            ## flag columns must come before lon, lat(the last two values are the coordinates)
+            df = LocalDataPreprocess.add_feature_flags(df)
+
+            # 6. Replace NaN
             df = LocalDataPreprocess.replace_nan(df)
 
-            # 6. change epgs:5174 to ordinary coordinates(epsg:4326)
+            # 7. change epgs:5174 to ordinary coordinates(epsg:4326)
             original_coord = np.array(df.loc[:, ['x', 'y']])
             input_type = "epsg:5174"
             output_type = "epsg:4326"
@@ -130,7 +137,7 @@ class LocalDataPreprocess(DataPreprocess):
             transformed_coord = ManageLonLat.project_array(original_coord, input_type, output_type)
             df.loc[:, ['lon', 'lat']] = transformed_coord
 
-            # 7.remove data which have invalid lat, lon
+            # 8.remove data which have invalid lat, lon
             df = ManageLonLat.return_vaild_data(df)
 
             df.reset_index(drop=True, inplace=True)
@@ -240,6 +247,16 @@ class LocalDataPreprocess(DataPreprocess):
 
         return df_new
 
+    @staticmethod
+    def add_feature_flags(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Flag columns(0/1) computed once per row from 업체명, so hashtags need no string matching at request time
+        """
+        flags = {flag: df['bplcNm'].str.contains(pattern, regex=True, na=False).astype(int)
+                 for flag, pattern in feature_flags.items()}
+
+        return df.assign(**flags)
+
     @staticmethod
     def add_backslash(text: str) -> str:
         pattern = r'(["\'])'  # 큰따옴표 또는 작은따옴표 패턴
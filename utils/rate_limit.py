@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker calling one API
+    - rate: tokens(requests) added per second
+    - burst: maximum number of tokens, i.e. requests allowed back to back after an idle period
+    - acquire() blocks until a token is available instead of a fixed sleep between requests
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError(f'rate must be positive and burst at least 1: rate={rate}, burst={burst}')
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.stats = {'acquired': 0, 'waits': 0, 'wait_seconds': 0.0}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take(self, waited: float) -> float:
+        """
+        Take one token if there is one(returns 0), seconds until the next token otherwise
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+
+            self.tokens -= 1
+            self.stats['acquired'] += 1
+            if waited > 0:
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += waited
+            return 0.0
+
+    def acquire(self) -> float:
+        """
+        Take one token, returns the seconds spent waiting for it
+        """
+        waited = 0.0
+        while True:
+            wait = self._take(waited)
+            if wait == 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def status(self) -> Dict:
+        with self._lock:
+            self._refill()
+            status = dict(self.stats)
+            status.update({'rate': self.rate, 'burst': self.burst, 'tokens': round(self.tokens, 3)})
+        return status
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    TokenBucket for coroutines on one event loop(utils/async_load_data.py)
+    - await acquire() instead of blocking the loop with time.sleep
+    """
+
+    async def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            wait = self._take(waited)
+            if wait == 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple, Mapping
+
+# optional fast paths, the stdlib is used when they are not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# bodies smaller than this are sent as is(compression would not pay for itself)
+min_compress_size = 1024
+
+# level 1: ~2.5ms and 45KB for a dense 1km response, level 6 costs ~6.5ms for 34KB(scripts/bench_response.py)
+gzip_level = 1
+brotli_quality = 5
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    UTF-8 JSON without \\uXXXX escapes(Korean names stay 3 bytes per character)
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """
+    {encoding: q} of an Accept-Encoding header
+    """
+    encodings = {}
+    for item in (accept_encoding or '').split(','):
+        parts = item.strip().split(';')
+        if not parts[0]:
+            continue
+
+        q = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[parts[0].strip().lower()] = q
+
+    return encodings
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    br when brotli is installed and accepted, then gzip, None for identity
+    """
+    encodings = accepted_encodings(accept_encoding)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = encodings.get(encoding, encodings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=gzip_level)
+    return body
+
+
+def encode_body(payload: Any, accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialized(and compressed when accepted) body with its headers
+    """
+    body = dumps(payload)
+    headers = {'Vary': 'Accept-Encoding'}
+
+    encoding = choose_encoding(accept_encoding) if len(body) >= min_compress_size else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+
+    return body, headers
+
+
+def make_etag(version: Optional[int], *parts: Any) -> str:
+    """
+    Weak ETag from the data version and the request parameters
+    - weak: the same for every Content-Encoding of the response
+    """
+    key = json.dumps([version, *parts], ensure_ascii=False, sort_keys=True, default=str)
+    return f'W/"{hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match uses the weak comparison
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def lookup_etag(version: Optional[int], path: str, args: Any) -> Optional[str]:
+    """
+    ETag of a GET lookup: served data version + path + query parameters(MultiDict of Flask/Quart)
+    - None while the version is unknown
+    """
+    if version is None:
+        return None
+    return make_etag(version, path, sorted(args.items(multi=True)))
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    # clients revalidate with If-None-Match instead of reusing blindly
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+
+def page_options(args: Mapping) -> Tuple[bool, Optional[int]]:
+    """
+    Query options for large radius responses, raises ValueError for a bad limit
+    - mode=summary: counts and hashtags only
+    - limit=k: top-k nearest places per facility kind(with next_cursor for the next page)
+    """
+    summary = args.get('mode') == 'summary'
+    limit = args.get('limit')
+
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError(f'limit must be positive: {limit}')
+
+    return summary, limit
@@ -0,0 +1,221 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple
+
+from utils.density import DensityGrid, DensityTiles, flag_layers, layer_name
+from utils.hashtag import hashtag_engine
+from utils.scoring import score_kernel
+from utils.facility import facility_registry
+
+
+# Seoul bounding box(lat_min, lon_min, lat_max, lon_max)
+seoul_bbox = (37.413, 126.734, 37.715, 127.269)
+
+# scores are stored as uint16 in units of 0.1(same rounding as calculate_score)
+score_scale = 10
+
+# one bit per hashtag rule
+hashtag_dtype = 'uint8' if len(hashtag_engine.rules) <= 8 else 'uint32'
+
+# tiles opened once per worker process(memory-mapped, shared page cache)
+_worker_tiles = None
+
+
+def _init_worker(tiles_path: str) -> None:
+    global _worker_tiles
+    _worker_tiles = DensityTiles(tiles_path)
+
+
+def disk_spans(tiles: DensityTiles, tile_row: int, radius_meter: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (rows, first col offset, last col offset + 1) of the circle around a cell center of tile_row
+    - the same for every cell of the row, a longitude shift does not change the circle
+    """
+    col = tiles.grid.n_cols // 2
+    lat, lon = tiles.grid.cell_center(tile_row, col)
+    rows, col_lo, col_end = tiles.row_spans(float(lat), float(lon), radius_meter)
+
+    return rows, col_lo - col, col_end - col
+
+
+def score_block(args: Tuple) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scores of raster rows [start, stop) for one radius, run in a worker process
+    - returns (start, individual scores(kinds, rows, cols), total scores(rows, cols), hashtag masks(rows, cols))
+    """
+    start, stop, radius_meter, raster = args
+    tiles = _worker_tiles
+    kinds, score_types, weight = raster['kinds'], raster['score_types'], raster['weight']
+    flag_pairs = [(facility, flag) for facility, flag in raster['flag_layers']]
+
+    tile_cols = raster['col0'] + np.arange(raster['n_cols']) * raster['stride']
+    n_rows = stop - start
+    counts = {name: np.zeros((n_rows, raster['n_cols']), dtype='int64')
+              for name in kinds + [layer_name(facility, flag) for facility, flag in flag_pairs]}
+
+    for i, raster_row in enumerate(range(start, stop)):
+        rows, lo, end = disk_spans(tiles, raster['row0'] + raster_row * raster['stride'], radius_meter)
+        col_lo = np.clip(tile_cols[None, :] + lo[:, None], 0, tiles.grid.n_cols)
+        col_end = np.clip(tile_cols[None, :] + end[:, None], 0, tiles.grid.n_cols)
+
+        for name, count in counts.items():
+            layer = tiles.layers[name]
+            count[i] = (layer[rows[:, None], col_end].astype('int64') - layer[rows[:, None], col_lo]).sum(axis=0)
+
+    # total_count includes metro, metro itself is not scored(calculate_score)
+    total_count = sum(counts[kind] for kind in kinds).reshape(-1)
+    cnt = np.stack([counts[kind].reshape(-1) for kind in score_types], axis=1)
+    individual, total_score = score_kernel(cnt, total_count, [weight[kind] for kind in score_types])
+
+    flag_counts = {}
+    for facility, flag in flag_pairs:
+        flag_counts.setdefault(facility, {})[flag] = counts[layer_name(facility, flag)]
+    mask = hashtag_engine.find_mask({kind: counts[kind] for kind in kinds}, flag_counts)
+
+    limit = np.iinfo('uint16').max
+    individual = np.clip(np.round(individual * score_scale), 0, limit).astype('uint16')
+    total_score = np.clip(np.round(total_score * score_scale), 0, limit).astype('uint16')
+
+    return (start,
+            individual.T.reshape(len(score_types), n_rows, raster['n_cols']),
+            total_score.reshape(n_rows, raster['n_cols']),
+            mask.astype(hashtag_dtype))
+
+
+def build_score_raster(tiles_path: str, out_dir: str, radii: List[int], bbox: Tuple[float, float, float, float] = seoul_bbox,
+                       raster_meter: float = 100.0, workers: int = None, block_rows: int = 16) -> Dict:
+    """
+    Evaluate calculate_score and find_hashtag on a regular grid from the density tiles
+    - raster cells are aligned with the tile cells(raster_meter = a multiple of the tile cell size)
+    - one memory-mapped .npy per radius and value: score_{r}.npy, individual_{r}.npy, hashtag_{r}.npy
+    """
+    tiles = DensityTiles(tiles_path)
+    grid = tiles.grid
+
+    kinds = [kind for kind in facility_registry if tiles.has_layer(kind)]
+    score_types = [kind for kind in kinds if kind != 'metro']
+    stride = max(int(round(raster_meter / grid.cell_meter)), 1)
+    row0, col0 = [int(value[0]) for value in grid.cell_index([bbox[0]], [bbox[1]])]
+    row1, col1 = [int(value[0]) for value in grid.cell_index([bbox[2]], [bbox[3]])]
+
+    raster = {'kinds': kinds,
+              'score_types': score_types,
+              # weights = places of each kind in the tiles(live table sizes at build time)
+              'weight': {kind: max(tiles.sizes[kind], 1) for kind in score_types},
+              'flag_layers': [[facility, flag] for facility, flag in flag_layers()
+                              if tiles.has_layer(layer_name(facility, flag))],
+              'stride': stride,
+              'row0': row0,
+              'col0': col0,
+              'n_rows': (row1 - row0) // stride + 1,
+              'n_cols': (col1 - col0) // stride + 1}
+
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tiles_path,)) as executor:
+        for radius_meter in radii:
+            shape = (raster['n_rows'], raster['n_cols'])
+            individual = np.lib.format.open_memmap(os.path.join(out_dir, f"individual_{radius_meter}.npy"), mode='w+',
+                                                   dtype='uint16', shape=(len(score_types),) + shape)
+            score = np.lib.format.open_memmap(os.path.join(out_dir, f"score_{radius_meter}.npy"), mode='w+',
+                                              dtype='uint16', shape=shape)
+            hashtag = np.lib.format.open_memmap(os.path.join(out_dir, f"hashtag_{radius_meter}.npy"), mode='w+',
+                                                dtype=hashtag_dtype, shape=shape)
+
+            blocks = [(start, min(start + block_rows, raster['n_rows']), radius_meter, raster)
+                      for start in range(0, raster['n_rows'], block_rows)]
+            for start, block_individual, block_score, block_mask in executor.map(score_block, blocks):
+                stop = start + block_score.shape[0]
+                individual[:, start:stop] = block_individual
+                score[start:stop] = block_score
+                hashtag[start:stop] = block_mask
+
+            for array in (individual, score, hashtag):
+                array.flush()
+            del individual, score, hashtag
+            print(f"score raster {radius_meter}m 완료: {raster['n_rows']} x {raster['n_cols']}")
+
+    meta = dict(raster, grid=grid.to_dict(), radii=list(radii), score_scale=score_scale,
+                hashtags=[rule.hashtag for rule in hashtag_engine.rules])
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    return meta
+
+
+class ScoreRaster:
+    """
+    Point and window lookups on the rasters written by build_score_raster
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+
+        self.path = path
+        self.tiles_grid = DensityGrid(**self.meta['grid'])
+        self.rasters = {}
+        for radius_meter in self.meta['radii']:
+            self.rasters[radius_meter] = {name: np.load(os.path.join(path, f"{name}_{radius_meter}.npy"), mmap_mode='r')
+                                          for name in ('score', 'individual', 'hashtag')}
+
+    def radii(self) -> List[int]:
+        return list(self.rasters)
+
+    def cell_center(self, row: np.ndarray, col: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        stride = self.meta['stride']
+        return self.tiles_grid.cell_center(self.meta['row0'] + np.asarray(row) * stride,
+                                           self.meta['col0'] + np.asarray(col) * stride)
+
+    def nearest_cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        grid, stride = self.tiles_grid, self.meta['stride']
+        row = int(round(((lat - grid.bbox[0]) / grid.cell_lat - 0.5 - self.meta['row0']) / stride))
+        col = int(round(((lon - grid.bbox[1]) / grid.cell_lon - 0.5 - self.meta['col0']) / stride))
+        return row, col
+
+    def cell_index(self, lat: float, lon: float) -> Tuple[int, int]:
+        """
+        Nearest raster cell, ValueError outside the raster
+        """
+        row, col = self.nearest_cell(lat, lon)
+        if not (0 <= row < self.meta['n_rows'] and 0 <= col < self.meta['n_cols']):
+            raise ValueError(f'location is outside the score raster: {lat}, {lon}')
+        return row, col
+
+    def get_raster(self, radius_meter: int) -> Dict[str, np.ndarray]:
+        if radius_meter not in self.rasters:
+            raise ValueError(f'radius must be one of {self.radii()}: {radius_meter}')
+        return self.rasters[radius_meter]
+
+    def point(self, radius_meter: int, lat: float, lon: float) -> Dict:
+        raster = self.get_raster(radius_meter)
+        row, col = self.cell_index(lat, lon)
+        cell_lat, cell_lon = self.cell_center(row, col)
+
+        individual = raster['individual'][:, row, col] / score_scale
+        return {'lat': float(cell_lat),
+                'lon': float(cell_lon),
+                'score': {'total_score': float(raster['score'][row, col]) / score_scale,
+                          'individual_score': dict(zip(self.meta['score_types'], individual.tolist()))},
+                'hashtag': hashtag_engine.decode(raster['hashtag'][row, col])}
+
+    def window(self, radius_meter: int, bbox: Tuple[float, float, float, float], step: int = 1, max_cells: int = 256) -> Dict:
+        """
+        Total scores of the raster cells inside bbox(every step-th cell), at most max_cells per side
+        """
+        raster = self.get_raster(radius_meter)
+        row_lo, col_lo = self.nearest_cell(bbox[0], bbox[1])
+        row_hi, col_hi = self.nearest_cell(bbox[2], bbox[3])
+        row_lo, row_hi = max(row_lo, 0), min(row_hi, self.meta['n_rows'] - 1)
+        col_lo, col_hi = max(col_lo, 0), min(col_hi, self.meta['n_cols'] - 1)
+        rows = np.arange(row_lo, row_hi + 1, step)
+        cols = np.arange(col_lo, col_hi + 1, step)
+
+        if len(rows) > max_cells or len(cols) > max_cells:
+            raise ValueError(f'window is larger than {max_cells} x {max_cells} cells, use a larger step')
+
+        lat, _ = self.cell_center(rows, 0)
+        _, lon = self.cell_center(0, cols)
+        score = raster['score'][np.ix_(rows, cols)] / score_scale
+        return {'lat': np.round(lat, 6).tolist(), 'lon': np.round(lon, 6).tolist(), 'score': score.tolist()}
@@ -0,0 +1,146 @@
+import numpy as np
+import asyncio
+import threading
+import time
+from typing import List, Dict, Tuple, Callable, Optional, Awaitable
+
+
+# 가중치 초기값(각 업종별 전체 데이터 개수), DB에서 못 가져올 때만 사용
+default_score_weight = {
+            'bus': 200000,
+            'cafe': 51000,
+            'convenience': 52000,
+            'gym': 35000,
+            'hair': 180000,
+            'hospital': 70000,
+            'mart':2700,
+            'laundry': 20000,
+            'pharmacy': 24000
+            }
+
+
+class ScoreWeights:
+    """
+    Per-kind weights = live table sizes
+    - fetched once and cached in-process
+    - refresh() marks them stale(called when the data version changes after an ingest run)
+    - default_score_weight when the sizes cannot be read, kept for retry_interval seconds or until refresh()
+      (a DB outage must not re-run the COUNT(*) queries on every scoring call)
+    """
+
+    def __init__(self, fetch_sizes: Callable[[List[str]], Dict[str, int]], facilities: List[str],
+                 retry_interval: float = 60.0) -> None:
+        self.fetch_sizes = fetch_sizes
+        self.facilities = facilities
+        self.retry_interval = retry_interval
+
+        self.weight = None
+        self.failed_at = None
+        self._lock = threading.Lock()
+
+    def cached(self) -> Optional[Dict[str, int]]:
+        """
+        Weights to use without a fetch, None when they have to be fetched
+        """
+        weight = self.weight
+        if weight is not None:
+            return weight
+
+        failed_at = self.failed_at
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_interval:
+            return default_score_weight
+        return None
+
+    def store(self, sizes: Dict[str, int]) -> Dict[str, int]:
+        # an empty table must not divide by zero
+        self.weight = {facility: max(int(size), 1) for facility, size in sizes.items()}
+        self.failed_at = None
+        print(f'score weight 갱신: {self.weight}')
+        return self.weight
+
+    def fail(self, e: Exception) -> Dict[str, int]:
+        # logged once per outage, not on every retry
+        if self.failed_at is None:
+            print(f"score weight 조회 실패, 기본값 사용: {e}")
+        self.failed_at = time.monotonic()
+        return default_score_weight
+
+    def get(self) -> Dict[str, int]:
+        weight = self.cached()
+        if weight is not None:
+            return weight
+
+        with self._lock:
+            weight = self.cached()
+            if weight is not None:
+                return weight
+
+            try:
+                sizes = self.fetch_sizes(self.facilities)
+            except Exception as e:
+                return self.fail(e)
+            return self.store(sizes)
+
+    def refresh(self, *args) -> None:
+        self.weight = None
+        self.failed_at = None
+
+
+class AsyncScoreWeights(ScoreWeights):
+    """
+    ScoreWeights for coroutines on one event loop(utils/async_manage_response.py)
+    - fetch_sizes is a coroutine function, await get() instead of blocking the loop on the COUNT(*) queries
+    """
+
+    def __init__(self, fetch_sizes: Callable[[List[str]], Awaitable[Dict[str, int]]], facilities: List[str],
+                 retry_interval: float = 60.0) -> None:
+        super().__init__(fetch_sizes, facilities, retry_interval)
+        # held across the fetch, a threading.Lock would block the loop
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Dict[str, int]:
+        weight = self.cached()
+        if weight is not None:
+            return weight
+
+        async with self._lock:
+            weight = self.cached()
+            if weight is not None:
+                return weight
+
+            try:
+                sizes = await self.fetch_sizes(self.facilities)
+            except Exception as e:
+                return self.fail(e)
+            return self.store(sizes)
+
+
+def score_kernel(cnt: np.ndarray, total_count: np.ndarray, weight: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score many locations at once
+    - cnt: (locations, kinds) facility counts
+    - total_count: (locations,) total facility count of each location
+    - weight: (kinds,) table size of each kind
+    - returns individual scores (locations, kinds) and total scores (locations,)
+    - a location without any facility scores 0
+    """
+    cnt = np.asarray(cnt, dtype='float64')
+    total_count = np.asarray(total_count, dtype='float64').reshape(-1, 1)
+    weight = np.asarray(weight, dtype='float64')
+
+    # 전체 중 비율 고려한 수치
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(total_count > 0, cnt / total_count * 100, 0.0)
+
+    # 가중치 고려한 보정 개수 수치
+    weighted_cnt = cnt / weight * 70000
+
+    # 개별 score - 소수 첫째자리까지 반올림
+    individual_score = np.round(rate + weighted_cnt, 1)
+
+    # 총 점수 = 평균 - 소수 첫째자리까지 반올림
+    if cnt.shape[1] == 0:
+        return individual_score, np.zeros(cnt.shape[0])
+    total_score = np.round(individual_score.mean(axis=1), 1)
+
+    return individual_score, total_score
@@ -0,0 +1,58 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key
+    - the first caller(leader) runs the function, callers arriving while it runs wait and share
+      its result(or its exception)
+    - nothing is kept after the call, repeated requests are the job of RadiusCache
+    - stats: executions = function runs, shared = calls answered without a run(saved DB executions)
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.stats = {'executions': 0, 'shared': 0}
+
+    def do(self, key: Hashable, function: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.stats['executions'] += 1
+            call.done.set()
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            status = dict(self.stats)
+            status['in_flight'] = len(self._calls)
+        return status
@@ -0,0 +1,185 @@
+import json
+import os
+import shutil
+import numpy as np
+from typing import List, Dict, Tuple, Optional, Iterable
+
+from utils.spatial_index import FacilityGrid, SpatialIndex, parse_places
+from utils.facility import facility_registry
+
+
+# string columns of the snapshot: response name, address and the original lat/lon text(CHAR columns)
+string_columns = ('name', 'address', 'lat_text', 'lon_text')
+
+# symlink to the newest snapshot directory inside the snapshot root
+current_link = 'current'
+
+# snapshot directories kept besides the current one(workers may still map an older one)
+keep_snapshots = 2
+
+
+class StringColumn:
+    """
+    UTF-8 strings packed in one blob
+    - value i = blob[offsets[i]:offsets[i + 1]], None where null[i]
+    - slices are views, strings are only decoded for the rows of a response
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, null: np.ndarray) -> None:
+        self.blob = blob
+        self.offsets = offsets
+        self.null = null
+
+    def __len__(self) -> int:
+        return len(self.null)
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        if self.null[i]:
+            return None
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def slice(self, start: int, stop: int) -> 'StringColumn':
+        return StringColumn(self.blob, self.offsets[start:stop + 1], self.null[start:stop])
+
+    @staticmethod
+    def encode(values: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype='int64')
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        blob = np.frombuffer(b''.join(encoded), dtype='uint8')
+        null = np.array([value is None for value in values], dtype=bool)
+
+        return blob, offsets, null
+
+
+class FacilitySnapshot:
+    """
+    Read-only columnar snapshot of every facility table, memory-mapped
+    - rows sorted by kind, then by FacilityGrid cell key, so every kind is one contiguous range
+      that SpatialIndex.from_snapshot uses as is
+    - N worker processes mapping the same files share one copy of the pages(OS page cache)
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+
+        self.path = path
+        self.version = meta['version']
+        self.cell_size = meta['cell_size']
+        self.kinds = meta['kinds']
+        self.ranges = {kind: tuple(kind_range) for kind, kind_range in meta['ranges'].items()}
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+        self.kind_code = load('kind')
+        self.keys = load('keys')
+        self.lat = load('lat')
+        self.lon = load('lon')
+        self.columns = {column: StringColumn(load(f"{column}_blob"), load(f"{column}_offsets"), load(f"{column}_null"))
+                        for column in string_columns}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def kind_range(self, kind: str) -> Tuple[int, int]:
+        return self.ranges[kind]
+
+    @classmethod
+    def open_current(cls, root: str) -> 'FacilitySnapshot':
+        # resolve once, a later swap of the link does not change an open snapshot
+        return cls(os.path.realpath(os.path.join(root, current_link)))
+
+
+def write_snapshot(root: str, rows_by_kind: Dict[str, Iterable[Tuple]], version: int,
+                   cell_size: float = SpatialIndex.default_cell_size) -> str:
+    """
+    Write a new snapshot directory and point root/current at it atomically
+    - rows: (name, address, lat, lon), rows without numeric lat/lon are skipped(parse_places, like SpatialIndex.add)
+    """
+    kinds, kind_codes, keys, lat, lon = [], [], [], [], []
+    columns = {column: [] for column in string_columns}
+    ranges = {}
+
+    for code, (kind, rows) in enumerate(rows_by_kind.items()):
+        parsed = parse_places(rows)
+
+        kind_lat = np.array([row[0] for row in parsed], dtype='float64')
+        kind_lon = np.array([row[1] for row in parsed], dtype='float64')
+        kind_keys = FacilityGrid.make_keys(kind_lat, kind_lon, cell_size)
+        order = np.argsort(kind_keys, kind='stable')
+
+        start = sum(len(value) for value in keys)
+        ranges[kind] = (start, start + len(parsed))
+        kinds.append(kind)
+        kind_codes.append(np.full(len(parsed), code, dtype='int16'))
+        keys.append(kind_keys[order])
+        lat.append(kind_lat[order])
+        lon.append(kind_lon[order])
+        for i, column in enumerate(string_columns):
+            columns[column] += [parsed[position][2 + i] for position in order.tolist()]
+
+    path = os.path.join(root, f"snapshot-{version}")
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    def save(name: str, array: np.ndarray) -> None:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+
+    save('kind', np.concatenate(kind_codes) if kind_codes else np.empty(0, dtype='int16'))
+    save('keys', np.concatenate(keys) if keys else np.empty(0, dtype='int64'))
+    save('lat', np.concatenate(lat) if lat else np.empty(0, dtype='float64'))
+    save('lon', np.concatenate(lon) if lon else np.empty(0, dtype='float64'))
+    for column in string_columns:
+        blob, offsets, null = StringColumn.encode(columns[column])
+        save(f"{column}_blob", blob)
+        save(f"{column}_offsets", offsets)
+        save(f"{column}_null", null)
+
+    meta = {'version': version, 'cell_size': cell_size, 'kinds': kinds, 'ranges': ranges}
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+
+    # swap the link atomically, then drop the oldest directories(open mappings stay valid)
+    link_path = os.path.join(root, current_link)
+    tmp_link = f"{link_path}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.basename(path), tmp_link)
+    os.replace(tmp_link, link_path)
+    remove_old_snapshots(root, os.path.basename(path))
+
+    return path
+
+
+def remove_old_snapshots(root: str, current: str) -> None:
+    snapshots = [name for name in os.listdir(root)
+                 if name.startswith('snapshot-') and not name.endswith('.tmp') and name != current]
+    snapshots.sort(key=lambda name: os.path.getmtime(os.path.join(root, name)))
+
+    for name in snapshots[:max(len(snapshots) - keep_snapshots, 0)]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def dump_facility_snapshot(dbm, root: str, facilities: List[str] = None) -> str:
+    """
+    Snapshot of the facility tables at the current data version, for the build/update scripts
+    """
+    rows_by_kind = {}
+    for facility in facilities or list(facility_registry):
+        spec = facility_registry[facility]
+        # kinds which are not built yet
+        if not dbm.has_table(spec.table):
+            continue
+        dbm.cursor.execute(f"SELECT {spec.name_column}, {spec.address_expression()}, lat, lon FROM {spec.table}")
+        rows_by_kind[facility] = dbm.cursor.fetchall()
+
+    os.makedirs(root, exist_ok=True)
+    path = write_snapshot(root, rows_by_kind, dbm.get_data_version())
+    print(f'facility snapshot 작성 완료: {path}')
+    return path
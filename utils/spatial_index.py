@@ -0,0 +1,224 @@
+import math
+import numpy as np
+from typing import Any, List, Dict, Tuple, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # utils/snapshot.py imports this module
+    from utils.snapshot import FacilitySnapshot
+
+# MySQL ST_Distance_Sphere default sphere radius(meter)
+EARTH_RADIUS = 6370986
+METER_PER_DEGREE = EARTH_RADIUS * np.pi / 180
+
+
+def haversine(lat: float, lon: float, lat_array: np.ndarray, lon_array: np.ndarray) -> np.ndarray:
+    """
+    Vectorized great circle distance(meter) from one point to many points
+    - same formula and radius as ST_Distance_Sphere
+    """
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+    lat_array_rad, lon_array_rad = np.radians(lat_array), np.radians(lon_array)
+
+    a = np.sin((lat_array_rad - lat_rad) / 2) ** 2 \
+        + np.cos(lat_rad) * np.cos(lat_array_rad) * np.sin((lon_array_rad - lon_rad) / 2) ** 2
+
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounding_box(lat: float, lon: float, radius_meter: float) -> Tuple[float, float, float, float]:
+    """
+    (lat_min, lon_min, lat_max, lon_max) enclosing every point within radius_meter
+    - exact bounds of a spherical cap, widened by a tiny margin for float error
+    """
+    angle = radius_meter / EARTH_RADIUS * (1 + 1e-6)
+    d_lat = np.degrees(angle)
+
+    # longitude bound from the cap tangent points, the whole circle when a pole is inside
+    cos_lat = np.cos(np.radians(lat))
+    if abs(lat) + d_lat >= 90 or np.sin(angle) >= cos_lat:
+        d_lon = 180.0
+    else:
+        d_lon = np.degrees(np.arcsin(np.sin(angle) / cos_lat))
+
+    return float(lat - d_lat), float(lon - d_lon), float(lat + d_lat), float(lon + d_lon)
+
+
+def parse_places(rows: Iterable[Tuple]) -> List[Tuple[float, float, Any, Any, Any, Any]]:
+    """
+    (lat, lon, name, address, lat_value, lon_value) of the (name, address, lat, lon) rows with numeric coordinates
+    - lat, lon are CHAR columns: NULL, blank or non-numeric values are skipped instead of failing the whole kind
+    - shared by SpatialIndex.add and write_snapshot(utils/snapshot.py), so both hold the same places
+    """
+    places = []
+    for name, address, lat_value, lon_value in rows:
+        try:
+            lat, lon = float(lat_value), float(lon_value)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(lat) and math.isfinite(lon):
+            places.append((lat, lon, name, address, lat_value, lon_value))
+
+    return places
+
+
+class FacilityGrid:
+    """
+    Uniform lat/lon grid over the places of one facility kind
+    - places are sorted by cell key(row * n_cols + col), so every grid row inside
+      a bounding box is one contiguous slice found with np.searchsorted
+    """
+    n_cols = 1 << 20
+
+    def __init__(self, kind: str, names: np.ndarray, addresses: np.ndarray,
+                 lat: np.ndarray, lon: np.ndarray, cell_size: float) -> None:
+        self.kind = kind
+        self.cell_size = cell_size
+
+        lat_float = np.asarray(lat, dtype='float64')
+        lon_float = np.asarray(lon, dtype='float64')
+        keys = self.make_keys(lat_float, lon_float, cell_size)
+        order = np.argsort(keys, kind='stable')
+
+        self.keys = keys[order]
+        self.lat = lat_float[order]
+        self.lon = lon_float[order]
+
+        # original values are kept for the response(lat, lon are CHAR columns in the DB)
+        self.names = np.asarray(names, dtype=object)[order]
+        self.addresses = np.asarray(addresses, dtype=object)[order]
+        self.lat_values = np.asarray(lat, dtype=object)[order]
+        self.lon_values = np.asarray(lon, dtype=object)[order]
+
+    @classmethod
+    def from_sorted(cls, kind: str, keys: np.ndarray, lat: np.ndarray, lon: np.ndarray, names, addresses,
+                    lat_values, lon_values, cell_size: float) -> 'FacilityGrid':
+        """
+        Grid over columns already sorted by make_keys(e.g. memory-mapped snapshot arrays, used without a copy)
+        - names, addresses, lat_values, lon_values: anything indexable by position
+        """
+        grid = cls.__new__(cls)
+        grid.kind = kind
+        grid.cell_size = cell_size
+        grid.keys, grid.lat, grid.lon = keys, lat, lon
+        grid.names, grid.addresses = names, addresses
+        grid.lat_values, grid.lon_values = lat_values, lon_values
+        return grid
+
+    @classmethod
+    def make_keys(cls, lat: np.ndarray, lon: np.ndarray, cell_size: float) -> np.ndarray:
+        rows = np.floor(np.asarray(lat) / cell_size).astype('int64')
+        cols = np.floor(np.asarray(lon) / cell_size).astype('int64')
+        return rows * cls.n_cols + cols
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def cell_row(self, lat: np.ndarray) -> np.ndarray:
+        return np.floor(np.asarray(lat) / self.cell_size).astype('int64')
+
+    def cell_col(self, lon: np.ndarray) -> np.ndarray:
+        return np.floor(np.asarray(lon) / self.cell_size).astype('int64')
+
+    def cell_key(self, row: np.ndarray, col: np.ndarray) -> np.ndarray:
+        return row * self.n_cols + col
+
+    def candidates(self, lat: float, lon: float, radius_meter: float) -> np.ndarray:
+        """
+        Positions of the places inside the bounding box of the circle
+        """
+        lat_min, lon_min, lat_max, lon_max = bounding_box(lat, lon, radius_meter)
+
+        rows = np.arange(self.cell_row(lat_min), self.cell_row(lat_max) + 1)
+        col_lo, col_hi = self.cell_col(lon_min), self.cell_col(lon_max)
+
+        starts = np.searchsorted(self.keys, self.cell_key(rows, col_lo), side='left')
+        ends = np.searchsorted(self.keys, self.cell_key(rows, col_hi), side='right')
+
+        slices = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        if not slices:
+            return np.empty(0, dtype='int64')
+        return np.concatenate(slices)
+
+    def query(self, lat: float, lon: float, radius_meter: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions and distances of the places within radius_meter, nearest first
+        """
+        positions = self.candidates(lat, lon, radius_meter)
+        distances = haversine(lat, lon, self.lat[positions], self.lon[positions])
+
+        inside = distances < radius_meter
+        positions, distances = positions[inside], distances[inside]
+
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+    def places(self, positions: np.ndarray, distances: np.ndarray) -> List[Dict]:
+        return [{'name': self.names[p],
+                 'distance': int(d),
+                 'address': self.addresses[p],
+                 'lat': self.lat_values[p],
+                 'lon': self.lon_values[p]}
+                for p, d in zip(positions.tolist(), distances.tolist())]
+
+
+class SpatialIndex:
+    """
+    In-process radius lookup over every facility kind
+    - answers the same facility_body as the radius SQL in request_to_rds
+    """
+
+    # 0.005 degree = about 550m(lat) x 450m(lon) in Korea
+    default_cell_size = 0.005
+
+    def __init__(self, cell_size: float = default_cell_size) -> None:
+        self.cell_size = cell_size
+        self.grids = {}
+
+    def add(self, kind: str, rows: Iterable[Tuple]) -> None:
+        """
+        rows: (name, address, lat, lon), rows without numeric lat/lon are skipped(parse_places)
+        """
+        places = parse_places(rows)
+        names = [place[2] for place in places]
+        addresses = [place[3] for place in places]
+        lat = [place[4] for place in places]
+        lon = [place[5] for place in places]
+
+        self.grids[kind] = FacilityGrid(kind, names, addresses, lat, lon, self.cell_size)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: 'FacilitySnapshot') -> 'SpatialIndex':
+        """
+        Index over a memory-mapped snapshot(utils/snapshot.py), nothing is copied or sorted
+        """
+        index = cls(cell_size=snapshot.cell_size)
+        for kind in snapshot.kinds:
+            start, stop = snapshot.kind_range(kind)
+            index.grids[kind] = FacilityGrid.from_sorted(kind, snapshot.keys[start:stop],
+                                                         snapshot.lat[start:stop], snapshot.lon[start:stop],
+                                                         snapshot.columns['name'].slice(start, stop),
+                                                         snapshot.columns['address'].slice(start, stop),
+                                                         snapshot.columns['lat_text'].slice(start, stop),
+                                                         snapshot.columns['lon_text'].slice(start, stop),
+                                                         snapshot.cell_size)
+        return index
+
+    def covers(self, facilities_type: List[str]) -> bool:
+        return all(facility in self.grids for facility in facilities_type)
+
+    def size(self) -> Dict[str, int]:
+        return {kind: len(grid) for kind, grid in self.grids.items()}
+
+    def query(self, facilities_type: List[str], lat: float, lon: float, radius_meter: int) -> Tuple[int, Dict]:
+        total_count = 0
+        facility_body = {facility: {"count": 0, "place": []} for facility in facilities_type}
+
+        for facility in facility_body:
+            grid = self.grids[facility]
+            positions, distances = grid.query(lat, lon, radius_meter)
+
+            facility_body[facility]['place'] = grid.places(positions, distances)
+            facility_body[facility]['count'] = len(positions)
+            total_count += len(positions)
+
+        return total_count, facility_body